@@ -0,0 +1,144 @@
+import json
+import os
+import shutil
+
+import numpy as np
+
+# Inverted-file (IVF) index for dense document vectors (Word2Vec, BERT) in
+# plain NumPy. Vectors are L2-normalised, so the dot product is the cosine.
+# A spherical k-means splits the corpus into n_lists clusters; the vectors are
+# stored grouped by cluster, so each cluster is one contiguous slice and a
+# query only multiplies the slices of its n_probe closest centroids, never
+# gathering (copying) rows out of the full matrix.
+ANN_FORMAT_VERSION = 1
+ARRAY_FILES = ('vectors', 'ids', 'centroids', 'offsets')
+
+
+def normalize_rows(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def assign(vectors, centroids, chunk_rows=8192):
+    labels = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), chunk_rows):
+        labels[start:start + chunk_rows] = np.argmax(vectors[start:start + chunk_rows] @ centroids.T, axis=1)
+    return labels
+
+
+def train_centroids(vectors, n_lists, iterations=10, sample_size=None, seed=0):
+    # Lloyd iterations on a sample; empty clusters are re-seeded from random points
+    rng = np.random.default_rng(seed)
+    sample_size = min(len(vectors), sample_size or 64 * n_lists)
+    sample = vectors[np.sort(rng.choice(len(vectors), sample_size, replace=False))]
+    centroids = sample[rng.choice(sample_size, n_lists, replace=False)].copy()
+    for _ in range(iterations):
+        labels = assign(sample, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, labels, sample)
+        empty = np.bincount(labels, minlength=n_lists) == 0
+        sums[empty] = sample[rng.choice(sample_size, int(empty.sum()))]
+        centroids = normalize_rows(sums)
+    return centroids
+
+
+class IVFIndex:
+    def __init__(self, vectors, ids, centroids, offsets, n_probe=16):
+        self.vectors = vectors
+        self.ids = ids
+        self.centroids = centroids
+        self.offsets = offsets
+        self.n_probe = n_probe
+        self.n_docs = len(ids)
+        # row id -> position in the cluster-grouped vectors, for filtered search
+        self.positions = np.empty(self.n_docs, dtype=np.int64)
+        self.positions[ids] = np.arange(self.n_docs)
+
+    @classmethod
+    def build(cls, doc_vectors, n_lists=None, n_probe=16, iterations=10, seed=0):
+        vectors = normalize_rows(doc_vectors)
+        n_lists = n_lists or max(1, int(np.sqrt(len(vectors))))
+        centroids = train_centroids(vectors, min(n_lists, len(vectors)), iterations, seed=seed)
+        labels = assign(vectors, centroids)
+        ids = np.argsort(labels, kind='stable').astype(np.int64)
+        offsets = np.concatenate([[0], np.cumsum(np.bincount(labels, minlength=len(centroids)))]).astype(np.int64)
+        return cls(vectors[ids], ids, centroids, offsets, n_probe)
+
+    def search(self, query_vector, k=10, rows=None, n_probe=None):
+        # Returns (row ids, scores) of the k best rows, highest score first.
+        # rows restricts the search to those row ids (e.g. facet filters).
+        query = normalize_rows(query_vector).ravel()
+        n_probe = min(n_probe or self.n_probe, len(self.centroids))
+        if rows is not None:
+            rows = np.asarray(rows)
+            if len(rows) == 0:
+                return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+            # Small candidate sets are scored exactly: the gather is only len(rows) vectors
+            if len(rows) <= k * n_probe or len(rows) * len(self.centroids) <= self.n_docs * n_probe:
+                return top_k(np.asarray(rows, dtype=np.int64), self.vectors[self.positions[rows]] @ query, k)
+            allowed = np.zeros(self.n_docs, dtype=bool)
+            allowed[self.positions[rows]] = True
+
+        order = np.argsort(-(self.centroids @ query), kind='stable')
+        found_ids, found_scores, found = [], [], 0
+        # Keep probing past n_probe until k allowed rows have been seen
+        for probed, cluster in enumerate(order):
+            if probed >= n_probe and found >= k:
+                break
+            start, end = self.offsets[cluster], self.offsets[cluster + 1]
+            scores = self.vectors[start:end] @ query
+            ids = self.ids[start:end]
+            if rows is not None:
+                keep = allowed[start:end]
+                scores, ids = scores[keep], ids[keep]
+            found_ids.append(ids)
+            found_scores.append(scores)
+            found += len(ids)
+        if not found_ids:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        return top_k(np.concatenate(found_ids), np.concatenate(found_scores), k)
+
+    def exact_search(self, query_vector, k=10, rows=None):
+        # Brute force over every (or every allowed) row, for recall checks
+        query = normalize_rows(query_vector).ravel()
+        rows = np.arange(self.n_docs, dtype=np.int64) if rows is None else np.asarray(rows, dtype=np.int64)
+        return top_k(rows, self.vectors[self.positions[rows]] @ query, k)
+
+    def save(self, path):
+        tmp_path = f"{path}.tmp-{os.getpid()}"
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        os.makedirs(tmp_path)
+        for key in ARRAY_FILES:
+            np.save(os.path.join(tmp_path, f"{key}.npy"), getattr(self, key))
+        with open(os.path.join(tmp_path, 'manifest.json'), 'w') as f:
+            json.dump({'format_version': ANN_FORMAT_VERSION, 'n_docs': self.n_docs, 'dim': int(self.vectors.shape[1]),
+                       'n_lists': len(self.centroids), 'n_probe': self.n_probe}, f, indent=2)
+        shutil.rmtree(path, ignore_errors=True)
+        os.rename(tmp_path, path)
+        return path
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        try:
+            with open(os.path.join(path, 'manifest.json')) as f:
+                manifest = json.load(f)
+            if manifest['format_version'] != ANN_FORMAT_VERSION:
+                return None
+            mmap_mode = 'r' if mmap else None
+            arrays = {key: np.load(os.path.join(path, f"{key}.npy"), mmap_mode=mmap_mode) for key in ARRAY_FILES}
+        except (OSError, ValueError, KeyError):
+            return None
+        return cls(arrays['vectors'], np.asarray(arrays['ids']), np.asarray(arrays['centroids']),
+                   np.asarray(arrays['offsets']), manifest['n_probe'])
+
+
+def top_k(ids, scores, k):
+    if k <= 0:
+        return ids[:0], scores[:0]
+    if len(ids) > k:
+        keep = np.argpartition(-scores, k - 1)[:k]
+        ids, scores = ids[keep], scores[keep]
+    order = np.lexsort((ids, -scores))
+    return ids[order], scores[order]
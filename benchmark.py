@@ -0,0 +1,1245 @@
+import argparse
+import json
+import multiprocessing
+import os
+import pickle
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import pandas as pd
+from sklearn.decomposition import TruncatedSVD
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.metrics.pairwise import cosine_similarity
+
+from ann_index import IVFIndex
+from dataset_mirror import DatasetMirror, HttpRemote
+from embeddings import EmbeddingStore, Word2VecEncoder, embed_corpus
+from engines import ENGINES, TfidfEngine
+from facets import build_facet_index, facet_counts, filter_rows
+from frame_store import frame_path, save_frame
+from hybrid import DenseReranker
+from index_builder import build_index
+from index_compaction import compact_index, index_size
+from ingestion import clean_course_frame, job_document_chunks, job_documents, read_job_frame
+from inverted_index import InvertedIndex
+from memory_layout import COURSE_CATEGORICAL, COURSE_COLUMNS, JOB_CATEGORICAL, JOB_COLUMNS, compact_frame, memory_report
+from offline_eval import load_judgements, ranking_metrics
+from recommender import job_filters, preprocess_text_simple, query_candidates, recommend_job, recommend_jobs_batch
+from shared_index import IndexHolder, SearchIndex
+from text_normalization import normalize_text_column
+from tfidf_index import TFIDF_DTYPE, build_or_load_index
+from tracing import Tracer, current_trace, span
+from warmup import Warmup
+
+SAMPLE_PROFILES = [
+    "I am a Programmer with experience in designing, developing, testing, and maintaining complex applications. "
+    "I have a strong understanding of industry best practices, and I'm proficient in writing clean, efficient code.",
+    "The job responsibilities I want to gain experience in include Data Engineering, Big Data Technologies, "
+    "Data Transformation, and Data Modelling.",
+    "Registered nurse with five years of patient care experience in hospital emergency departments.",
+    "Marketing graduate skilled in social media campaigns, SEO, content writing and Google Analytics.",
+    "Accountant familiar with tax reporting, auditing, Excel and financial statements.",
+]
+
+
+def synthetic_job_frame(n_docs=49194, vocab_size=60000, doc_len=250, seed=0):
+    # Zipf-distributed tokens roughly mimic the long tail of real job descriptions
+    rng = np.random.default_rng(seed)
+    vocab = np.array([f"term{i}" for i in range(vocab_size)] + preprocess_text_simple(" ".join(SAMPLE_PROFILES)).split())
+    ranks = np.minimum(rng.zipf(1.2, size=(n_docs, doc_len)), len(vocab)) - 1
+    descriptions = [" ".join(vocab[row]) for row in ranks]
+    return pd.DataFrame({
+        'title': [f"Job {i}" for i in range(n_docs)],
+        'description_x': descriptions,
+        'skills_desc': "",
+        'formatted_experience_level': rng.choice(['Entry level', 'Mid-Senior level', 'Associate', 'Director', 'Unknown'], n_docs),
+        'formatted_work_type': rng.choice(['Full-time', 'Part-time', 'Contract', 'Internship'], n_docs),
+        'name': rng.choice([f"Company {i}" for i in range(5000)], n_docs),
+        'country': rng.choice(['Indonesia', 'United States', 'Singapore', 'Unknown'], n_docs),
+        'city': 'Unknown',
+        'job_posting_url': 'Unknown',
+        'min_salary': np.where(rng.random(n_docs) < 0.7, np.nan, rng.integers(30, 200, n_docs) * 1000.0),
+        'max_salary': np.nan,
+        # Columns the app never reads, as in the real export
+        'company_id': rng.integers(0, 10**6, n_docs),
+        'location': 'Unknown',
+        'job_id': np.arange(n_docs),
+    })
+
+
+def load_job_frame(path):
+    # The loader as it was before the schema-typed ingestion stage
+    df = pd.read_csv(path, on_bad_lines='skip', engine='python')
+    df = df.drop_duplicates(subset=['description_x'])
+    df = df.fillna("Unknown")
+    return df
+
+
+def build_job_index(df):
+    combined = df['title'].fillna('') + ' ' + df['description_x'].fillna('') + ' ' + df['skills_desc'].fillna('')
+    vectorizer = TfidfVectorizer(stop_words='english')
+    tfidf_matrix = vectorizer.fit_transform(normalize_text_column(combined))
+    return vectorizer, tfidf_matrix
+
+
+def legacy_recommend_job(user_input, df, vectorizer, tfidf_matrix, experience_levels=None, work_types=None, name=None, country=None):
+    # The pre-top-K implementation, kept only as the baseline for comparisons
+    user_tfidf = vectorizer.transform([preprocess_text_simple(user_input)])
+    cosine_similarities = cosine_similarity(user_tfidf, tfidf_matrix).flatten()
+    above_zero = cosine_similarities > 0
+    if not any(above_zero):
+        return None
+    top_job_indices = np.where(above_zero)[0]
+    top_job_indices = top_job_indices[np.argsort(cosine_similarities[top_job_indices])[::-1]]
+    top_jobs = df.iloc[top_job_indices].copy()
+    top_jobs['cosine_similarity'] = cosine_similarities[top_job_indices]
+    if experience_levels:
+        top_jobs = top_jobs[top_jobs['formatted_experience_level'].isin(experience_levels)]
+    if work_types:
+        top_jobs = top_jobs[top_jobs['formatted_work_type'].isin(work_types)]
+    if name and name != 'All':
+        top_jobs = top_jobs[top_jobs['name'] == name]
+    if country and country != 'All':
+        top_jobs = top_jobs[top_jobs['country'] == country]
+    if top_jobs.empty:
+        return None
+    top_jobs.reset_index(drop=True, inplace=True)
+    return top_jobs
+
+
+def measure(fn, queries, repeat=3):
+    latencies = []
+    for _ in range(repeat):
+        for query in queries:
+            start = time.perf_counter()
+            fn(query)
+            latencies.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    for query in queries:
+        fn(query)
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    latencies = np.array(latencies) * 1000
+    return {
+        'p50_ms': round(float(np.percentile(latencies, 50)), 3),
+        'p95_ms': round(float(np.percentile(latencies, 95)), 3),
+        'p99_ms': round(float(np.percentile(latencies, 99)), 3),
+        'mean_ms': round(float(latencies.mean()), 3),
+        'peak_alloc_mb': round(peak / 2**20, 2),
+    }
+
+
+def load_corpus(args):
+    if args.jobs:
+        return read_job_frame(args.jobs).fillna("Unknown")
+    return synthetic_job_frame(args.synthetic_docs)
+
+
+def bench_topk(args):
+    df = load_corpus(args)
+    vectorizer, tfidf_matrix = build_job_index(df)
+
+    legacy = legacy_recommend_job(SAMPLE_PROFILES[0], df, vectorizer, tfidf_matrix)
+    current = recommend_job(SAMPLE_PROFILES[0], df, vectorizer, tfidf_matrix, top_k=args.top_k)
+    same_order = (
+        legacy['title'].head(len(current)).tolist() == current['title'].tolist()
+        and np.allclose(legacy['cosine_similarity'].to_numpy()[:len(current)], current['cosine_similarity'].to_numpy())
+    )
+
+    return {
+        'docs': len(df),
+        'top_k': args.top_k,
+        'same_scores_as_legacy': bool(same_order),
+        'legacy': measure(lambda q: legacy_recommend_job(q, df, vectorizer, tfidf_matrix), SAMPLE_PROFILES, args.repeat),
+        'top_k_engine': measure(lambda q: recommend_job(q, df, vectorizer, tfidf_matrix, top_k=args.top_k), SAMPLE_PROFILES, args.repeat),
+    }
+
+
+def bench_facets(args):
+    df = load_corpus(args)
+    vectorizer, tfidf_matrix = build_job_index(df)
+    facets = build_facet_index(df, ['formatted_experience_level', 'formatted_work_type', 'name', 'country'])
+
+    company = df['name'].value_counts().index[0]
+    scenarios = {
+        'country': {'country': df['country'].iloc[0]},
+        'work_type+experience': {'work_types': ['Contract'], 'experience_levels': ['Entry level']},
+        'company': {'name': company},
+    }
+    results = {'docs': len(df)}
+    for label, filters in scenarios.items():
+        legacy = legacy_recommend_job(SAMPLE_PROFILES[0], df, vectorizer, tfidf_matrix, **filters)
+        current = recommend_job(SAMPLE_PROFILES[0], df, vectorizer, tfidf_matrix, top_k=None, facets=facets, **filters)
+        if legacy is None or current is None:
+            matches = legacy is None and current is None
+        else:
+            matches = legacy['title'].tolist() == current['title'].tolist()
+        results[label] = {
+            'candidate_rows': len(filter_rows(df, facets, job_filters(**filters))),
+            'same_results_as_legacy': bool(matches),
+            'legacy': measure(lambda q: legacy_recommend_job(q, df, vectorizer, tfidf_matrix, **filters), SAMPLE_PROFILES, args.repeat),
+            'frame_masks': measure(lambda q: recommend_job(q, df, vectorizer, tfidf_matrix, top_k=args.top_k, **filters), SAMPLE_PROFILES, args.repeat),
+            'facet_first': measure(lambda q: recommend_job(q, df, vectorizer, tfidf_matrix, top_k=args.top_k, facets=facets, **filters), SAMPLE_PROFILES, args.repeat),
+        }
+
+    # Step 2 widget options on every rerun: the old unique()/sorted() scans of
+    # the frame vs. facet counts over a query's candidate rows
+    candidates = {q: query_candidates(q, vectorizer, tfidf_matrix) for q in SAMPLE_PROFILES}
+    selections = job_filters(work_types=['Contract'])
+
+    def rescan(_):
+        [level for level in df['formatted_experience_level'].unique().tolist() if level != "Unknown"]
+        [wt for wt in df['formatted_work_type'].unique().tolist() if wt != "Unknown" and wt != "Other"]
+        sorted([country for country in df['country'].unique().tolist() if country != "Unknown"])
+        sorted([company for company in df['name'].unique().tolist() if company != "Unknown"])
+
+    counts = facet_counts(facets, selections, candidates[SAMPLE_PROFILES[0]])
+    expected = df.iloc[candidates[SAMPLE_PROFILES[0]]]
+    expected = expected[expected['formatted_work_type'] == 'Contract']['country'].value_counts()
+    results['widget_options'] = {
+        'counts_match_value_counts': bool((counts['country'][expected.index] == expected).all()),
+        'rescan_frame': measure(rescan, SAMPLE_PROFILES, args.repeat),
+        'facet_counts': measure(lambda q: facet_counts(facets, selections, candidates[q]), SAMPLE_PROFILES, args.repeat),
+    }
+    return results
+
+
+def bench_inverted(args):
+    results = {'top_k': args.top_k, 'corpus_sizes': {}}
+    for n_docs in args.sizes:
+        df = load_corpus(args).head(n_docs) if args.jobs else synthetic_job_frame(n_docs)
+        vectorizer, tfidf_matrix = build_job_index(df)
+        start = time.perf_counter()
+        engine = InvertedIndex(tfidf_matrix)
+        build_s = time.perf_counter() - start
+
+        matches = True
+        for query in SAMPLE_PROFILES:
+            expected = recommend_job(query, df, vectorizer, tfidf_matrix, top_k=args.top_k)
+            actual = recommend_job(query, df, vectorizer, tfidf_matrix, top_k=args.top_k, engine=engine)
+            if expected is None or actual is None:
+                matches &= expected is None and actual is None
+            else:
+                matches &= (expected['title'].tolist() == actual['title'].tolist()
+                            and np.allclose(expected['cosine_similarity'], actual['cosine_similarity']))
+
+        results['corpus_sizes'][len(df)] = {
+            'same_results_as_matrix': bool(matches),
+            'inverted_build_s': round(build_s, 3),
+            'matrix': measure(lambda q: recommend_job(q, df, vectorizer, tfidf_matrix, top_k=args.top_k), SAMPLE_PROFILES, args.repeat),
+            'inverted': measure(lambda q: recommend_job(q, df, vectorizer, tfidf_matrix, top_k=args.top_k, engine=engine), SAMPLE_PROFILES, args.repeat),
+        }
+    return results
+
+
+def bench_batch(args):
+    df = load_corpus(args)
+    vectorizer, tfidf_matrix = build_job_index(df)
+    results = {'docs': len(df), 'users': {}}
+    for n_users in args.users:
+        profiles = [SAMPLE_PROFILES[i % len(SAMPLE_PROFILES)] for i in range(n_users)]
+        looped = [recommend_job(p, df, vectorizer, tfidf_matrix, top_k=args.top_k) for p in profiles]
+        batched = recommend_jobs_batch(profiles, df, vectorizer, tfidf_matrix, top_k=args.top_k, chunk_size=args.chunk_size)
+        matches = all(
+            (a is None and b is None) or (a is not None and b is not None and a['title'].tolist() == b['title'].tolist())
+            for a, b in zip(looped, batched)
+        )
+        results['users'][n_users] = {
+            'same_results_as_loop': matches,
+            'loop': measure(lambda ps: [recommend_job(p, df, vectorizer, tfidf_matrix, top_k=args.top_k) for p in ps], [profiles], args.repeat),
+            'batch': measure(lambda ps: recommend_jobs_batch(ps, df, vectorizer, tfidf_matrix, top_k=args.top_k, chunk_size=args.chunk_size), [profiles], args.repeat),
+        }
+    return results
+
+
+def bench_normalize(args):
+    df = load_corpus(args)
+    combined = df['title'].fillna('') + ' ' + df['description_x'].fillna('') + ' ' + df['skills_desc'].fillna('')
+    same = combined.apply(preprocess_text_simple).tolist() == normalize_text_column(combined).tolist()
+    return {
+        'docs': len(df),
+        'byte_identical': same,
+        'apply': measure(lambda s: s.apply(preprocess_text_simple), [combined], args.repeat),
+        'column': measure(lambda s: normalize_text_column(s, chunk_size=args.chunk_size), [combined], args.repeat),
+    }
+
+
+def bench_build(args):
+    work_dir = tempfile.mkdtemp(prefix='tristep-bench-')
+    path = args.jobs
+    if not path:
+        path = os.path.join(work_dir, 'jobs.csv')
+        synthetic_job_frame(args.synthetic_docs).to_csv(path, index=False)
+
+    start = time.perf_counter()
+    df = load_job_frame(path)
+    build_job_index(df)
+    results = {'docs': len(df), 'in_process_fit_s': round(time.perf_counter() - start, 3), 'parallel': {}}
+    del df
+
+    for workers in args.workers:
+        start = time.perf_counter()
+        _, timings = build_index('job', f"bench-{workers}", job_document_chunks(path, args.chunk_docs), workers=workers,
+                                 index_dir=os.path.join(work_dir, 'index'))
+        results['parallel'][workers] = {
+            'total_s': round(time.perf_counter() - start, 3),
+            **{stage: round(seconds, 3) for stage, seconds in timings.items()},
+        }
+    # ru_maxrss is in KiB on Linux; children covers the pool workers
+    results['peak_rss_mb'] = {
+        'parent': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        'largest_worker': round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024, 1),
+    }
+    shutil.rmtree(work_dir, ignore_errors=True)
+    return results
+
+
+# Each loader runs in a fresh interpreter that imports only pandas, so the
+# peak RSS reported is the loader's own footprint.
+LOADERS = {
+    'python_engine_full_read': (
+        "import pandas as pd\n"
+        "df = pd.read_csv(path, on_bad_lines='skip', engine='python')\n"
+        "df = df.drop_duplicates(subset=['description_x']).fillna('Unknown')"
+    ),
+    'schema_chunked_c_engine': (
+        "from ingestion import read_job_frame\n"
+        "df = read_job_frame(path).fillna('Unknown')"
+    ),
+}
+# ru_maxrss survives fork+exec on Linux, so the harness reads the per-process
+# high-water mark (VmHWM, in KiB) instead.
+LOADER_HARNESS = """
+import json, sys, time
+{preamble}
+def peak_rss_kb():
+    with open('/proc/self/status') as f:
+        return next(int(line.split()[1]) for line in f if line.startswith('VmHWM'))
+path = sys.argv[1]
+baseline = peak_rss_kb()
+start = time.perf_counter()
+{loader}
+seconds = time.perf_counter() - start
+print(json.dumps({{
+    'rows': len(df),
+    'wall_s': round(seconds, 3),
+    'baseline_rss_mb': round(baseline / 1024, 1),
+    'peak_rss_mb': round(peak_rss_kb() / 1024, 1),
+}}))
+"""
+
+
+def run_loaders(loaders, path, *extra_args, preamble="import pandas"):
+    # preamble runs before the baseline is taken, so imports are not counted
+    results = {}
+    for label, loader in loaders.items():
+        code = LOADER_HARNESS.format(preamble=preamble, loader=loader)
+        output = subprocess.run([sys.executable, '-c', code, path, *extra_args], capture_output=True, text=True,
+                                check=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+        results[label] = json.loads(output.stdout)
+    return results
+
+
+def bench_ingest(args):
+    work_dir = tempfile.mkdtemp(prefix='tristep-bench-')
+    path = args.jobs
+    if not path:
+        path = os.path.join(work_dir, 'jobs.csv')
+        synthetic_job_frame(args.synthetic_docs).to_csv(path, index=False)
+
+    results = {'csv_mb': round(os.path.getsize(path) / 2**20, 1)}
+    results.update(run_loaders(LOADERS, path))
+    shutil.rmtree(work_dir, ignore_errors=True)
+    return results
+
+
+# The cleaned job frame as main.load_job_data gets it: rebuilt from the CSV,
+# or opened from the Arrow cache with and without the description column.
+FRAME_LOADERS = {
+    'rebuild_from_csv': (
+        "df = read_job_frame(path)\n"
+        "df['title'] = remove_asterisks_column(df['title'])\n"
+        "df = df.fillna('Unknown')"
+    ),
+    'arrow_all_columns': (
+        "df = load_frame('job', 'bench', sys.argv[2]).to_pandas().fillna('Unknown')"
+    ),
+    'arrow_projected': (
+        "store = load_frame('job', 'bench', sys.argv[2])\n"
+        "df = store.to_pandas([c for c in store.columns if c != 'description_x']).fillna('Unknown')\n"
+        "descriptions = store.values('description_x', df.index[:5])"
+    ),
+}
+FRAME_PREAMBLE = (
+    "import pandas, pyarrow\n"
+    "from frame_store import load_frame\n"
+    "from ingestion import read_job_frame\n"
+    "from text_normalization import remove_asterisks_column"
+)
+
+
+def bench_frames(args):
+    work_dir = tempfile.mkdtemp(prefix='tristep-bench-')
+    path = args.jobs
+    if not path:
+        path = os.path.join(work_dir, 'jobs.csv')
+        synthetic_job_frame(args.synthetic_docs).to_csv(path, index=False)
+    frame_dir = os.path.join(work_dir, 'frames')
+    df = read_job_frame(path)
+    save_frame('job', 'bench', df, frame_dir)
+
+    results = {
+        'csv_mb': round(os.path.getsize(path) / 2**20, 1),
+        'arrow_mb': round(os.path.getsize(frame_path('job', 'bench', frame_dir)) / 2**20, 1),
+    }
+    results.update(run_loaders(FRAME_LOADERS, path, frame_dir, preamble=FRAME_PREAMBLE))
+    shutil.rmtree(work_dir, ignore_errors=True)
+    return results
+
+
+def bench_memory(args):
+    # Serving footprint before (every column as "Unknown"-filled objects,
+    # float64 matrix) and after the compact layout main.py now uses
+    work_dir = tempfile.mkdtemp(prefix='tristep-bench-')
+    path = args.jobs
+    if not path:
+        path = os.path.join(work_dir, 'jobs.csv')
+        synthetic_job_frame(args.synthetic_docs).to_csv(path, index=False)
+    df = read_job_frame(path)
+    shutil.rmtree(work_dir, ignore_errors=True)
+    corpus = normalize_text_column(job_documents(df))
+
+    legacy = df.fillna("Unknown").astype(object)
+    legacy_matrix = TfidfVectorizer(stop_words='english').fit_transform(corpus)
+    compact = compact_frame(df, JOB_COLUMNS, JOB_CATEGORICAL)
+    compact_matrix = TfidfVectorizer(stop_words='english', dtype=TFIDF_DTYPE).fit_transform(corpus)
+
+    vectorizer = TfidfVectorizer(stop_words='english', dtype=TFIDF_DTYPE).fit(corpus)
+    legacy_vectorizer = TfidfVectorizer(stop_words='english').fit(corpus)
+    same_top_k = []
+    for profile in SAMPLE_PROFILES:
+        expected = recommend_job(profile, legacy, legacy_vectorizer, legacy_matrix, top_k=args.top_k)
+        actual = recommend_job(profile, compact, vectorizer, compact_matrix, top_k=args.top_k)
+        same_top_k.append(bool(expected is not None and actual is not None
+                               and set(expected.index) == set(actual.index)
+                               and np.allclose(expected['cosine_similarity'], actual['cosine_similarity'], atol=1e-5)))
+
+    report = memory_report(
+        {'job_frame': legacy, 'job_tfidf': legacy_matrix},
+        {'job_frame': compact, 'job_tfidf': compact_matrix},
+    )
+    report['same_top_k'] = all(same_top_k)
+    return report
+
+
+def dense_doc_vectors(tfidf_matrix, dim, seed=0):
+    # Stand-in for the notebooks' Word2Vec/BERT doc_vectors: an LSA projection
+    # of the TF-IDF matrix gives dense vectors with real topical structure.
+    svd = TruncatedSVD(n_components=dim, random_state=seed)
+    return svd.fit_transform(tfidf_matrix).astype(np.float32), svd
+
+
+def bench_ann(args):
+    df = load_corpus(args)
+    vectorizer, tfidf_matrix = build_job_index(df)
+    doc_vectors, _ = dense_doc_vectors(tfidf_matrix, args.dim)
+    rng = np.random.default_rng(0)
+    # Queries: held-in documents with noise, so each has a meaningful neighbourhood
+    queries = doc_vectors[rng.choice(len(doc_vectors), args.queries, replace=False)]
+    queries = queries + rng.normal(scale=0.25 * queries.std(), size=queries.shape).astype(np.float32)
+
+    start = time.perf_counter()
+    index = IVFIndex.build(doc_vectors, n_lists=args.n_lists)
+    results = {'docs': len(doc_vectors), 'dim': args.dim, 'n_lists': len(index.centroids),
+               'build_s': round(time.perf_counter() - start, 3), 'k': args.top_k}
+
+    work_dir = tempfile.mkdtemp(prefix='tristep-bench-')
+    loaded = IVFIndex.load(index.save(os.path.join(work_dir, 'ann')))
+    results['reload_same_results'] = bool(np.array_equal(loaded.search(queries[0], args.top_k)[0], index.search(queries[0], args.top_k)[0]))
+    shutil.rmtree(work_dir, ignore_errors=True)
+
+    filtered_rows = filter_rows(df, build_facet_index(df, ['country']), job_filters(country=df['country'].iloc[0]))
+    scenarios = {'unfiltered': None, 'country_filter': filtered_rows}
+    for label, rows in scenarios.items():
+        truth = [set(index.exact_search(q, args.top_k, rows)[0].tolist()) for q in queries]
+        # The notebooks' path: fancy-index the allowed rows, then brute-force cosine
+        subset = np.arange(len(doc_vectors)) if rows is None else rows
+        scenario = {
+            'candidate_rows': len(subset),
+            'notebook_bruteforce': measure(lambda q: cosine_similarity([q], doc_vectors[subset]), queries, args.repeat),
+            'exact_numpy': measure(lambda q: index.exact_search(q, args.top_k, rows), queries, args.repeat),
+        }
+        for n_probe in args.n_probe:
+            found = [set(index.search(q, args.top_k, rows, n_probe)[0].tolist()) for q in queries]
+            recall = np.mean([len(f & t) / max(len(t), 1) for f, t in zip(found, truth)])
+            scenario[f"ivf_probe_{n_probe}"] = {
+                'recall_at_k': round(float(recall), 4),
+                **measure(lambda q: index.search(q, args.top_k, rows, n_probe), queries, args.repeat),
+            }
+        results[label] = scenario
+    return results
+
+
+class LsaEncoder:
+    # Query side of dense_doc_vectors, so the stand-in vectors can be re-ranked against
+    model_name = 'lsa-standin'
+
+    def __init__(self, vectorizer, svd):
+        self.vectorizer = vectorizer
+        self.projection = np.ascontiguousarray(svd.components_.T, dtype=vectorizer.dtype)
+        self.dim = svd.n_components
+
+    def encode(self, texts):
+        return np.asarray(self.vectorizer.transform(texts) @ self.projection)
+
+
+def bench_hybrid(args):
+    df = load_corpus(args)
+    vectorizer, tfidf_matrix = build_job_index(df)
+    doc_vectors, svd = dense_doc_vectors(tfidf_matrix, args.dim)
+    reranker = DenseReranker(doc_vectors, LsaEncoder(vectorizer, svd))
+    judgements = load_judgements(args.labels, 'Step 2') if args.labels else {}
+    profiles = list(judgements) or SAMPLE_PROFILES
+    results = {'docs': len(df), 'profiles': len(profiles), 'candidates': args.top_k, 'k': args.k,
+               'dense_vectors': 'LSA stand-in', 'judged_labels': bool(judgements)}
+
+    baseline = {}
+    modes = {'tfidf': None, **{f"hybrid_w{weight}": weight for weight in args.weights}}
+    for label, weight in modes.items():
+        run = lambda q: recommend_job(q, df, vectorizer, tfidf_matrix, top_k=args.top_k,
+                                      reranker=None if weight is None else DenseReranker(doc_vectors, reranker.encoder, weight))
+        ranked = {q: [] if (rows := run(q)) is None else rows['title'].tolist() for q in profiles}
+        report = {'latency': measure(run, profiles, args.repeat)}
+        if judgements:
+            report.update(ranking_metrics(ranked, judgements, args.k))
+        if weight is None:
+            baseline = ranked
+        else:
+            overlap = [len(set(ranked[q][:args.k]) & set(baseline[q][:args.k])) / args.k for q in profiles]
+            report[f"overlap_at_{args.k}_with_tfidf"] = round(float(np.mean(overlap)), 3)
+        results[label] = report
+    return results
+
+
+COMPACTION_SETTINGS = [
+    {'min_df': 2},
+    {'min_df': 5},
+    {'min_df': 2, 'max_df': 0.5},
+    {'min_df': 2, 'max_terms': 200},
+    {'min_df': 2, 'max_df': 0.5, 'max_terms': 100},
+    {'min_df': 5, 'max_df': 0.5, 'max_terms': 50},
+]
+
+
+def compaction_arg(value):
+    # 'min_df=2,max_df=0.5,max_terms=200'
+    setting = {}
+    for item in value.split(','):
+        key, number = item.split('=')
+        setting[key.strip()] = float(number) if '.' in number else int(number)
+    return setting
+
+
+def bench_compaction(args):
+    # Index size, Step 2 latency and ranking quality of each compaction
+    # setting against the full float32 index the app serves
+    df = load_corpus(args)
+    full = TfidfEngine().fit(normalize_text_column(job_documents(df)))
+    judgements = load_judgements(args.labels, 'Step 2') if args.labels else {}
+    profiles = list(judgements) or SAMPLE_PROFILES
+    titles = df['title'].to_numpy()
+
+    def report(engine, baseline=None):
+        ranked = {profile: titles[ids].tolist() for profile, (ids, _) in zip(profiles, engine.batch_query(profiles, args.k))}
+        result = {**index_size(engine.tfidf_matrix),
+                  'latency': measure(lambda q: engine.recommend_job(q, df, top_k=args.top_k), profiles, args.repeat)}
+        if judgements:
+            result.update(ranking_metrics(ranked, judgements, args.k))
+        if baseline is not None:
+            overlap = [len(set(ranked[q]) & set(baseline['ranked'][q])) / args.k for q in profiles]
+            result[f"overlap_at_{args.k}_with_full"] = round(float(np.mean(overlap)), 3)
+            result['nnz_reduction_pct'] = round((1 - result['nnz'] / baseline['nnz']) * 100, 1)
+            result['p50_reduction_pct'] = round((1 - result['latency']['p50_ms'] / baseline['latency']['p50_ms']) * 100, 1)
+            if judgements:
+                key = f"prec_at_{args.k}"
+                result[f"{key}_change"] = round(result[key] - baseline[key], 4)
+        return result, ranked
+
+    results = {'docs': len(df), 'profiles': len(profiles), 'judged_labels': bool(judgements), 'k': args.k}
+    baseline, ranked = report(full)
+    results['full'] = baseline
+    baseline = {**baseline, 'ranked': ranked}
+    for setting in args.settings or COMPACTION_SETTINGS:
+        start = time.perf_counter()
+        vectorizer, tfidf_matrix = compact_index(full.vectorizer, full.tfidf_matrix, **setting)
+        compact_s = time.perf_counter() - start
+        result, _ = report(TfidfEngine(vectorizer, tfidf_matrix), baseline)
+        results[','.join(f"{key}={value}" for key, value in setting.items())] = {'compact_s': round(compact_s, 3), **result}
+    return results
+
+
+def bench_suite(args):
+    # The runningtime notebooks' 1/5/10/20/50-user scenarios, for every engine
+    # through the same interface and the same preprocessing
+    df = load_corpus(args)
+    corpus = normalize_text_column(job_documents(df))
+    judgements = load_judgements(args.labels, 'Step 2') if args.labels else {}
+    test_cases = list(judgements) or SAMPLE_PROFILES
+    results = {'docs': len(df), 'top_k': args.top_k, 'test_cases': len(test_cases)}
+
+    for name in args.engines:
+        # tracemalloc would slow the Python-heavy fits, so memory is the
+        # process high-water mark (ru_maxrss, KB on Linux) after each build
+        start = time.perf_counter()
+        try:
+            engine = ENGINES[name]().fit(corpus)
+        except ImportError as exc:
+            results[name] = {'skipped': str(exc)}
+            continue
+        report = {'build_s': round(time.perf_counter() - start, 3),
+                  'peak_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)}
+
+        for users in args.users:
+            profiles = [test_cases[i % len(test_cases)] for i in range(users)]
+            run = lambda q: engine.recommend_job(q, df, top_k=args.top_k)
+            scenario = measure(run, profiles, args.repeat)
+            start = time.perf_counter()
+            for _ in range(args.repeat):
+                for profile in profiles:
+                    run(profile)
+            scenario['throughput_qps'] = round(users * args.repeat / (time.perf_counter() - start), 2)
+            start = time.perf_counter()
+            for _ in range(args.repeat):
+                engine.batch_query(profiles, args.top_k)
+            scenario['batch_throughput_qps'] = round(users * args.repeat / (time.perf_counter() - start), 2)
+            report[f"{users}_users"] = scenario
+        results[name] = report
+    return results
+
+
+class PaddedCostEncoder:
+    # Stand-in for BertEncoder with the same cost shape: work grows with
+    # batch size x padded length, and a document's vector does not depend on
+    # what else is in its batch (masked mean over hashed token embeddings).
+    # Every call also pays a fixed cost, as a model forward pass does
+    # (tokenizer set-up, weights streamed through every layer): the work of
+    # call_overhead_tokens tokens, whatever the batch holds.
+    model_name = 'padded-cost-standin'
+
+    def __init__(self, dim=768, hidden=64, max_length=512, call_overhead_tokens=0, seed=0):
+        rng = np.random.default_rng(seed)
+        self.dim, self.max_length = dim, max_length
+        self.table = rng.standard_normal((4096, hidden)).astype(np.float32)
+        self.projection = rng.standard_normal((hidden, dim)).astype(np.float32)
+        self.overhead = self.table[:call_overhead_tokens]
+
+    def tokens(self, text):
+        return [hash(word) % len(self.table) for word in text.split()[:self.max_length]] or [0]
+
+    def token_lengths(self, texts):
+        return [len(self.tokens(text)) for text in texts]
+
+    def encode(self, texts):
+        np.tanh(self.overhead @ self.projection)
+        ids = [self.tokens(text) for text in texts]
+        width = max(len(row) for row in ids)
+        padded = np.zeros((len(ids), width), dtype=np.int64)
+        mask = np.zeros((len(ids), width, 1), dtype=np.float32)
+        for i, row in enumerate(ids):
+            padded[i, :len(row)] = row
+            mask[i, :len(row)] = 1
+        hidden = np.tanh(self.table[padded] @ self.projection)
+        return (hidden * mask).sum(axis=1) / mask.sum(axis=1)
+
+
+def bench_embed(args):
+    rng = np.random.default_rng(0)
+    # Postings of very different lengths, as in the real sheets
+    pool = " ".join(synthetic_job_frame(200)['description_x']).split()
+    lengths = np.clip(rng.lognormal(4.5, 0.8, args.docs).astype(int), 5, 600)
+    starts = rng.integers(0, len(pool) - 600, args.docs)
+    texts = [" ".join(pool[start:start + n]) for start, n in zip(starts, lengths)]
+    encoder = PaddedCostEncoder(call_overhead_tokens=args.call_overhead_tokens)
+    work_dir = tempfile.mkdtemp(prefix='tristep-bench-')
+    results = {'docs': args.docs, 'mean_tokens': round(float(lengths.mean()), 1), 'batch_size': args.batch_size,
+               'call_overhead_tokens': args.call_overhead_tokens, 'workers': args.workers}
+
+    start = time.perf_counter()
+    one_at_a_time = np.stack([encoder.encode([text])[0] for text in texts])
+    results['one_doc_per_call_s'] = round(time.perf_counter() - start, 3)
+
+    start = time.perf_counter()
+    for begin in range(0, len(texts), args.batch_size):
+        encoder.encode(texts[begin:begin + args.batch_size])
+    results['unsorted_batches_s'] = round(time.perf_counter() - start, 3)
+
+    store = EmbeddingStore(os.path.join(work_dir, 'store'), encoder.model_name, encoder.dim)
+    start = time.perf_counter()
+    vectors, stats = embed_corpus(texts, encoder, store, args.batch_size, args.workers)
+    results['length_buckets_s'] = round(time.perf_counter() - start, 3)
+    results['same_vectors'] = bool(np.allclose(vectors, one_at_a_time, atol=1e-5))
+
+    # Refresh with 5% of postings edited: only those are embedded again
+    edited = list(texts)
+    for i in rng.choice(len(texts), len(texts) // 20, replace=False):
+        edited[i] = edited[i] + " updated"
+    reopened = EmbeddingStore(os.path.join(work_dir, 'store'), encoder.model_name, encoder.dim)
+    start = time.perf_counter()
+    _, refresh_stats = embed_corpus(edited, encoder, reopened, args.batch_size, args.workers)
+    results['refresh_5pct_changed_s'] = round(time.perf_counter() - start, 3)
+    results['refresh_embedded'] = refresh_stats['embedded']
+    shutil.rmtree(work_dir, ignore_errors=True)
+    return results
+
+
+class KeyedVectorsStandIn:
+    # The parts of gensim's KeyedVectors that get_document_vector touches
+    def __init__(self, words, vectors):
+        self.index_to_key = list(words)
+        self.key_to_index = {word: i for i, word in enumerate(self.index_to_key)}
+        self.vectors = vectors
+        self.vector_size = vectors.shape[1]
+
+    def __contains__(self, word):
+        return word in self.key_to_index
+
+    def __getitem__(self, word):
+        return self.vectors[self.key_to_index[word]]
+
+
+def notebook_document_vector(doc, wv, tokenizer):
+    # get_document_vector from the Word2Vec notebooks
+    words = tokenizer(doc)
+    word_vectors = [wv[word] for word in words if word in wv]
+    if len(word_vectors) == 0:
+        return np.zeros(wv.vector_size)
+    return np.mean(word_vectors, axis=0)
+
+
+def bench_word2vec(args):
+    df = synthetic_job_frame(args.docs)
+    texts = df['description_x'].tolist()
+    # Leave some words out of the vocabulary, as min_count or a stale model would
+    words = [word for i, word in enumerate(sorted({word for text in texts for word in text.split()})) if i % 10 < 6]
+    vectors = np.random.default_rng(0).standard_normal((len(words), 100)).astype(np.float32)
+    wv = KeyedVectorsStandIn(words, vectors)
+    tokenizer = str.split
+    texts.append("zzunknown qqunknown")
+    results = {'docs': len(texts), 'vocabulary': len(words)}
+
+    start = time.perf_counter()
+    loop = np.array([notebook_document_vector(text, wv, tokenizer) for text in texts])
+    results['per_document_loop_s'] = round(time.perf_counter() - start, 3)
+
+    encoder = Word2VecEncoder.from_model(wv, tokenizer)
+    start = time.perf_counter()
+    vectorized = encoder.encode(texts)
+    results['sparse_product_s'] = round(time.perf_counter() - start, 3)
+    results['speedup'] = round(results['per_document_loop_s'] / results['sparse_product_s'], 1)
+    results['identical'] = bool(np.array_equal(vectorized, loop.astype(np.float32)))
+
+    # Tokenization is the same work on both paths; without it (tokens already
+    # kept for training) only the lookups and the averaging remain
+    tokenized = encoder.tokenize(texts)
+    start = time.perf_counter()
+    for tokens in tokenized:
+        word_vectors = [wv[word] for word in tokens if word in wv]
+        np.mean(word_vectors, axis=0) if word_vectors else np.zeros(wv.vector_size)
+    results['pretokenized_loop_s'] = round(time.perf_counter() - start, 3)
+    start = time.perf_counter()
+    encoder.encode_tokens(tokenized)
+    results['pretokenized_sparse_product_s'] = round(time.perf_counter() - start, 3)
+    results['pretokenized_speedup'] = round(results['pretokenized_loop_s'] / results['pretokenized_sparse_product_s'], 1)
+
+    queries = [" ".join(profile.lower().split()) for profile in SAMPLE_PROFILES]
+    results['query_loop_ms'] = measure(lambda q: notebook_document_vector(q, wv, tokenizer), queries, args.repeat)['mean_ms']
+    results['query_encoder_ms'] = measure(encoder.encode_query, queries, args.repeat)['mean_ms']
+    results['queries_identical'] = all(
+        np.array_equal(encoder.encode_query(q), notebook_document_vector(q, wv, tokenizer).astype(np.float32)) for q in queries)
+    return results
+
+
+def bench_sessions(args):
+    # N sessions rerunning the script concurrently (Streamlit runs each
+    # session's rerun on its own thread). Before: every rerun unpickles its own
+    # copy of the cached bundle, as st.cache_data does. After: every rerun
+    # gets the holder's shared SearchIndex.
+    raw = load_corpus(args)
+    vectorizer, tfidf_matrix = build_job_index(raw)
+    df = compact_frame(raw, JOB_COLUMNS, JOB_CATEGORICAL)
+    del raw
+    facets = build_facet_index(df, ['formatted_experience_level', 'formatted_work_type', 'name', 'country'])
+    pickled = pickle.dumps((df, vectorizer, tfidf_matrix, facets, 'bench'), protocol=pickle.HIGHEST_PROTOCOL)
+
+    holder = IndexHolder('job', lambda version: SearchIndex('job', version, df, vectorizer, tfidf_matrix, facets))
+    holder.load('bench')
+    loaders = {
+        'cache_data_copy': lambda: pickle.loads(pickled)[0],
+        'shared_holder': lambda: holder.load('bench').df,
+    }
+
+    results = {'sessions': args.sessions, 'reruns_per_session': args.reruns, 'pickled_mb': round(len(pickled) / 2**20, 1)}
+    for label, load in loaders.items():
+        def session(_):
+            latencies = []
+            for _ in range(args.reruns):
+                start = time.perf_counter()
+                frame = load()
+                # What the Step 2 page does on every rerun before any search
+                frame['country'].unique()
+                latencies.append(time.perf_counter() - start)
+            return latencies
+
+        with ThreadPoolExecutor(max_workers=args.sessions) as pool:
+            latencies = np.concatenate([np.array(s) for s in pool.map(session, range(args.sessions))]) * 1000
+        # Memory in a second pass, as tracemalloc would distort the timings
+        tracemalloc.start()
+        with ThreadPoolExecutor(max_workers=args.sessions) as pool:
+            list(pool.map(session, range(args.sessions)))
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        results[label] = {
+            'p50_ms': round(float(np.percentile(latencies, 50)), 3),
+            'p95_ms': round(float(np.percentile(latencies, 95)), 3),
+            'peak_alloc_mb': round(peak / 2**20, 2),
+        }
+    return results
+
+
+def bench_pages(args):
+    # What one session keeps after a search and what showing a page costs:
+    # the copied result frame the pages used to slice, against int32 ids and
+    # float32 scores with the page's rows copied from the shared frame.
+    raw = load_corpus(args)
+    df = compact_frame(raw, JOB_COLUMNS, JOB_CATEGORICAL)
+    engine = TfidfEngine().fit(normalize_text_column(job_documents(raw)))
+    # A broad query: the opening of a posting matches a large share of the corpus
+    profile = " ".join(raw['description_x'].iloc[0].split()[:40])
+    del raw
+    results = {'docs': len(df), 'per_page': args.per_page}
+    for top_k in args.top_k:
+        frame = engine.recommend_job(profile, df, top_k=top_k)
+        result_set = engine.recommend_job(profile, df, top_k=top_k, lazy=True)
+        last_page = max(len(result_set) - args.per_page, 0)
+        results[f"top_k_{top_k or 'all'}"] = {
+            'rows': len(result_set),
+            'frame_session_mb': round(frame.memory_usage(deep=True).sum() / 2**20, 3),
+            'result_set_session_kb': round((result_set.row_ids.nbytes + result_set.scores.nbytes) / 2**10, 3),
+            'same_order': frame['cosine_similarity'].tolist() == result_set.rows(df)['cosine_similarity'].tolist(),
+            'frame_page': measure(lambda start: list(frame.iloc[start:start + args.per_page].iterrows()),
+                                  [0, last_page], args.repeat),
+            'result_set_page': measure(lambda start: list(result_set.rows(df, start, start + args.per_page).iterrows()),
+                                       [0, last_page], args.repeat),
+        }
+    return results
+
+
+# State the load workers serve from. Set before the process pool forks, so
+# every worker shares the parent's loaded index pages copy-on-write.
+LOAD_TARGET = {}
+
+
+def proc_status_mb(field, path='/proc/self/status'):
+    with open(path) as f:
+        return next(int(line.split()[1]) for line in f if line.startswith(field)) / 1024
+
+
+def serve_request(profile):
+    # One Step 2 search as main.py runs it; returns the service time and the
+    # worker's memory (PSS splits shared pages between the processes mapping them)
+    target = LOAD_TARGET
+    start = time.perf_counter()
+    target['engine'].recommend_job(profile, target['df'], facets=target['facets'], **target['filters'])
+    return time.perf_counter() - start, os.getpid(), proc_status_mb('Pss', '/proc/self/smaps_rollup')
+
+
+def bench_load(args):
+    raw = load_corpus(args)
+    df = compact_frame(raw, JOB_COLUMNS, JOB_CATEGORICAL)
+    vectorizer, tfidf_matrix = build_job_index(raw)
+    del raw
+    judgements = load_judgements(args.labels, 'Step 2') if args.labels else {}
+    test_cases = list(judgements) or SAMPLE_PROFILES
+    LOAD_TARGET.update(engine=TfidfEngine(vectorizer, tfidf_matrix), df=df,
+                       facets=build_facet_index(df, ['formatted_experience_level', 'formatted_work_type', 'name', 'country']),
+                       filters=dict(work_types=['Full-time']) if args.filtered else {})
+    requests = [test_cases[i % len(test_cases)] for i in range(args.requests)]
+    results = {'docs': len(df), 'requests': args.requests, 'test_cases': len(test_cases), 'cpus': os.cpu_count(),
+               'baseline_rss_mb': round(proc_status_mb('VmRSS'), 1)}
+
+    pools = {
+        'threads': lambda workers: ThreadPoolExecutor(max_workers=workers),
+        'processes': lambda workers: ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('fork')),
+    }
+    for kind in args.pools:
+        curve = {}
+        for workers in args.concurrency:
+            rss_before = proc_status_mb('VmRSS')
+            rss_peak = [rss_before]
+            done = threading.Event()
+
+            def sample_rss():
+                while not done.wait(0.01):
+                    rss_peak[0] = max(rss_peak[0], proc_status_mb('VmRSS'))
+
+            with pools[kind](workers) as pool:
+                # Warm every worker up first, so start-up is not counted as load
+                list(pool.map(serve_request, requests[:workers]))
+                sampler = threading.Thread(target=sample_rss, daemon=True)
+                sampler.start()
+                start = time.perf_counter()
+                served = list(pool.map(serve_request, requests))
+                wall = time.perf_counter() - start
+                done.set()
+                sampler.join()
+            latencies = np.array([latency for latency, _, _ in served]) * 1000
+            pss = {}
+            for _, pid, worker_pss in served:
+                pss[pid] = max(pss.get(pid, 0.0), worker_pss)
+            point = {
+                'throughput_qps': round(len(requests) / wall, 2),
+                'p50_ms': round(float(np.percentile(latencies, 50)), 3),
+                'p95_ms': round(float(np.percentile(latencies, 95)), 3),
+                'p99_ms': round(float(np.percentile(latencies, 99)), 3),
+                'max_ms': round(float(latencies.max()), 3),
+            }
+            if kind == 'threads':
+                point['peak_rss_growth_mb'] = round(rss_peak[0] - rss_before, 1)
+            else:
+                point['workers_pss_mb'] = round(sum(pss.values()), 1)
+            curve[workers] = point
+        results[kind] = curve
+    return results
+
+
+def bench_trace(args):
+    # The same Step 2 search with tracing off and on, plus the stage breakdown
+    # the traced runs recorded. Traces go to a private Tracer whose log lines
+    # are discarded, so only the cost of timing and recording is measured.
+    raw = load_corpus(args)
+    df = compact_frame(raw, JOB_COLUMNS, JOB_CATEGORICAL)
+    vectorizer, tfidf_matrix = build_job_index(raw)
+    del raw
+    engine = TfidfEngine(vectorizer, tfidf_matrix)
+    facets = build_facet_index(df, ['formatted_experience_level', 'formatted_work_type', 'name', 'country'])
+    filters = dict(work_types=['Full-time']) if args.filtered else {}
+    local_tracer = Tracer(enabled=False)
+
+    def search(profile):
+        with local_tracer.request('job_search'):
+            engine.recommend_job(profile, df, facets=facets, **filters)
+
+    calls = 100000
+    start = time.perf_counter()
+    for _ in range(calls):
+        with span('stage'):
+            pass
+    disabled_span_ns = (time.perf_counter() - start) / calls * 1e9
+
+    results = {'docs': len(df), 'filtered': args.filtered, 'disabled_span_ns': round(disabled_span_ns, 1),
+               'disabled': measure(search, SAMPLE_PROFILES, args.repeat)}
+    local_tracer.enabled = True
+    results['enabled'] = measure(search, SAMPLE_PROFILES, args.repeat)
+    with local_tracer.request('span_cost'):
+        start = time.perf_counter()
+        for _ in range(calls):
+            with span('stage'):
+                pass
+        results['enabled_span_ns'] = round((time.perf_counter() - start) / calls * 1e9, 1)
+    results['overhead_p50_pct'] = round(
+        (results['enabled']['p50_ms'] / results['disabled']['p50_ms'] - 1) * 100, 2)
+    results['stages'] = local_tracer.summary()['job_search']
+    assert current_trace.get() is None
+    return results
+
+
+class SheetStandIn(BaseHTTPRequestHandler):
+    # Local stand-in for the sheet export: serves server.body with server.etag
+    # and answers a matching If-None-Match with 304.
+    def do_GET(self):
+        server = self.server
+        server.requests += 1
+        if self.headers.get('If-None-Match') == server.etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header('ETag', server.etag)
+        self.send_header('Content-Length', str(len(server.body)))
+        self.end_headers()
+        self.wfile.write(server.body)
+
+    def log_message(self, *args):
+        pass
+
+
+def bench_mirror(args):
+    work_dir = tempfile.mkdtemp(prefix='tristep-bench-')
+    path = args.jobs
+    if not path:
+        path = os.path.join(work_dir, 'jobs.csv')
+        synthetic_job_frame(args.synthetic_docs).to_csv(path, index=False)
+    with open(path, 'rb') as f:
+        body = f.read()
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), SheetStandIn)
+    server.body, server.etag, server.requests = body, '"v1"', 0
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/export?format=csv"
+    mirror = DatasetMirror(root=os.path.join(work_dir, 'mirror'), remote=HttpRemote(), refresh_seconds=0)
+
+    def timed(fn):
+        start = time.perf_counter()
+        value = fn()
+        return value, round((time.perf_counter() - start) * 1000, 2)
+
+    results = {'csv_mb': round(len(body) / 2**20, 1)}
+    (cold_path, cold_hash), results['cold_fetch_ms'] = timed(lambda: mirror.get('jobs.csv', url))
+    # refresh_seconds=0 makes every get start a background check; the caller
+    # still gets the local copy without waiting for it.
+    _, results['warm_get_ms'] = timed(lambda: mirror.get('jobs.csv', url))
+    mirror.refresh('jobs.csv', url)
+    _, results['unchanged_refresh_ms'] = timed(lambda: mirror.refresh('jobs.csv', url))
+    unchanged = mirror.read_meta('jobs.csv')['sha256'] == cold_hash
+
+    server.body, server.etag = body + b'\n', '"v2"'
+    meta, results['changed_refresh_ms'] = timed(lambda: mirror.refresh('jobs.csv', url))
+    changed = meta['sha256'] != cold_hash and not os.path.exists(cold_path)
+
+    server.shutdown()
+    server.server_close()
+    (offline_path, offline_hash), results['offline_get_ms'] = timed(lambda: mirror.get('jobs.csv', url))
+    mirror.refresh('jobs.csv', url)
+    results['requests_served'] = server.requests
+    results['unchanged_content_kept'] = unchanged
+    results['changed_content_replaced'] = changed
+    results['offline_serves_local_copy'] = offline_hash == meta['sha256'] and os.path.isfile(offline_path)
+    results['offline_error_recorded'] = 'last_error' in mirror.status().get('jobs.csv', {})
+    shutil.rmtree(work_dir, ignore_errors=True)
+    return results
+
+
+def synthetic_course_frame(n_docs=8092, seed=0):
+    rng = np.random.default_rng(seed)
+    vocab = np.array([f"skill{i}" for i in range(5000)])
+    return pd.DataFrame({
+        'Title': [f"Course {i}" for i in range(n_docs)],
+        'Short Intro': [" ".join(vocab[np.minimum(rng.zipf(1.3, 40), len(vocab)) - 1]) for _ in range(n_docs)],
+        'Skills': [" ".join(vocab[np.minimum(rng.zipf(1.3, 10), len(vocab)) - 1]) for _ in range(n_docs)],
+        'Category': rng.choice(['Data Science', 'Business', 'Computer Science', 'Information Technology'], n_docs),
+        'Sub-Category': rng.choice(['Machine Learning', 'Finance', 'Software Development', 'Networking'], n_docs),
+        'Site': rng.choice(['Coursera', 'Udacity', 'edX', 'Udemy'], n_docs),
+        'URL': 'Unknown',
+        'Rating': [f"{rating:.1f}stars" for rating in rng.uniform(3, 5, n_docs)],
+        'Number of viewers': [f"{viewers:,}" for viewers in rng.integers(100, 10**6, n_docs)],
+        'Language': 'English',
+        'Subtitle Languages': rng.choice(['Subtitles: English', 'Subtitles: English, Spanish', None], n_docs),
+    })
+
+
+def startup_job_index(report, mirror, url, index_dir):
+    # The app's Step 2 fetch-and-fit pipeline, without the Streamlit caches
+    report('fetching')
+    csv_path, csv_hash = mirror.get('jobs.csv', url)
+    report('indexing')
+    raw = read_job_frame(csv_path)
+    df = compact_frame(raw, JOB_COLUMNS, JOB_CATEGORICAL)
+    build_or_load_index('job', csv_hash, df.index, lambda: normalize_text_column(job_documents(raw)), index_dir=index_dir)
+    return build_facet_index(df, ['formatted_experience_level', 'formatted_work_type', 'name', 'country'])
+
+
+def startup_course_index(report, mirror, url, index_dir):
+    report('fetching')
+    csv_path, csv_hash = mirror.get('courses.csv', url)
+    report('indexing')
+    df, combined = clean_course_frame(csv_path)
+    compact = compact_frame(df[COURSE_COLUMNS], COURSE_COLUMNS, COURSE_CATEGORICAL, fill_value=None)
+    build_or_load_index('course', csv_hash, compact.index, lambda: normalize_text_column(combined), index_dir=index_dir)
+    return build_facet_index(compact, ['Site', 'Subtitle Languages'], {'Subtitle Languages': ','})
+
+
+def bench_startup(args):
+    # Time to first paint of the Home page, and until each index can serve,
+    # for a cold start (empty mirror, no snapshot) and a warm one. 'eager'
+    # runs both pipelines before the first page as main.py used to;
+    # 'background' submits them to a Warmup and paints straight away.
+    work_dir = tempfile.mkdtemp(prefix='tristep-bench-')
+    sources = {}
+    for name, path, synthetic in (('job', args.jobs, lambda: synthetic_job_frame(args.synthetic_docs)),
+                                  ('course', args.courses, synthetic_course_frame)):
+        if not path:
+            path = os.path.join(work_dir, f"{name}.csv")
+            synthetic().to_csv(path, index=False)
+        with open(path, 'rb') as f:
+            server = ThreadingHTTPServer(('127.0.0.1', 0), SheetStandIn)
+            server.body, server.etag, server.requests = f.read(), f'"{name}"', 0
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        sources[name] = (server, f"http://127.0.0.1:{server.server_address[1]}/export?format=csv")
+    pipelines = {'job': startup_job_index, 'course': startup_course_index}
+
+    results = {'csv_mb': {name: round(len(server.body) / 2**20, 1) for name, (server, _) in sources.items()}}
+    for start in ('cold', 'warm'):
+        for mode in ('eager', 'background'):
+            if start == 'cold':
+                shutil.rmtree(os.path.join(work_dir, 'mirror'), ignore_errors=True)
+                shutil.rmtree(os.path.join(work_dir, 'index'), ignore_errors=True)
+            mirror = DatasetMirror(root=os.path.join(work_dir, 'mirror'), remote=HttpRemote())
+            began = time.perf_counter()
+            warmup = Warmup()
+            for name, (_, url) in sources.items():
+                if mode == 'eager':
+                    pipelines[name](lambda stage: None, mirror, url, os.path.join(work_dir, 'index'))
+                else:
+                    warmup.submit(name, pipelines[name], mirror, url, os.path.join(work_dir, 'index'))
+            report = {'first_paint_s': round(time.perf_counter() - began, 3)}
+            for name in sources:
+                if mode == 'background':
+                    warmup.result(name)
+                    report[f"{name}_ready_s"] = round(warmup.elapsed(name), 3)
+                else:
+                    report[f"{name}_ready_s"] = report['first_paint_s']
+            report['all_ready_s'] = round(time.perf_counter() - began, 3)
+            warmup.shutdown()
+            results[f"{start}_{mode}"] = report
+    for server, _ in sources.values():
+        server.shutdown()
+        server.server_close()
+    shutil.rmtree(work_dir, ignore_errors=True)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="TriStep recommender benchmarks")
+    parser.add_argument('--jobs', help="Local copy of the job CSV export (synthetic corpus if omitted)")
+    parser.add_argument('--courses', help="Local copy of the course CSV export (startup only; synthetic if omitted)")
+    parser.add_argument('--synthetic-docs', type=int, default=49194)
+    parser.add_argument('--repeat', type=int, default=3)
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    topk = subparsers.add_parser('topk', help="Top-K selection vs. full sort and copy")
+    topk.add_argument('--top-k', type=int, default=100)
+    topk.set_defaults(run=bench_topk)
+
+    facet = subparsers.add_parser('facets', help="Facet-first candidate restriction vs. filtering after scoring")
+    facet.add_argument('--top-k', type=int, default=100)
+    facet.set_defaults(run=bench_facets)
+
+    inverted = subparsers.add_parser('inverted', help="Inverted-index engine vs. matrix product at growing corpus sizes")
+    inverted.add_argument('--top-k', type=int, default=100)
+    inverted.add_argument('--sizes', type=int, nargs='+', default=[12500, 25000, 49194])
+    inverted.set_defaults(run=bench_inverted)
+
+    batch = subparsers.add_parser('batch', help="Batched scoring vs. one recommend_job call per profile")
+    batch.add_argument('--top-k', type=int, default=100)
+    batch.add_argument('--users', type=int, nargs='+', default=[1, 5, 10, 20, 50])
+    batch.add_argument('--chunk-size', type=int, default=64)
+    batch.set_defaults(run=bench_batch)
+
+    normalize = subparsers.add_parser('normalize', help="Column normalisation vs. per-row preprocess_text_simple")
+    normalize.add_argument('--chunk-size', type=int, default=2000)
+    normalize.set_defaults(run=bench_normalize)
+
+    build = subparsers.add_parser('build', help="Chunked process-pool index build vs. in-process fit")
+    build.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    build.add_argument('--chunk-docs', type=int, default=5000)
+    build.set_defaults(run=bench_build)
+
+    ingest = subparsers.add_parser('ingest', help="Schema-typed chunked CSV ingestion vs. the old full read")
+    ingest.set_defaults(run=bench_ingest)
+
+    frames = subparsers.add_parser('frames', help="Arrow frame cache with column projection vs. rebuilding from the CSV")
+    frames.set_defaults(run=bench_frames)
+
+    memory = subparsers.add_parser('memory', help="Memory report: compact frame and float32 index vs. the old layout")
+    memory.add_argument('--top-k', type=int, default=100)
+    memory.set_defaults(run=bench_memory)
+
+    ann = subparsers.add_parser('ann', help="IVF index for dense doc vectors: recall@K and latency vs. exact search")
+    ann.add_argument('--top-k', type=int, default=10)
+    ann.add_argument('--dim', type=int, default=100)
+    ann.add_argument('--n-lists', type=int, default=None)
+    ann.add_argument('--n-probe', type=int, nargs='+', default=[1, 2, 4, 8, 16, 32])
+    ann.add_argument('--queries', type=int, default=200)
+    ann.set_defaults(run=bench_ann)
+
+    compaction = subparsers.add_parser('compaction', help="TF-IDF index compaction: size, latency and Prec@K against the full index")
+    compaction.add_argument('--labels', help="Hand-judged evaluation.xlsx (Prec@K is skipped without it)")
+    compaction.add_argument('--settings', type=compaction_arg, nargs='+',
+                            help="Settings such as min_df=2,max_df=0.5,max_terms=200 (a built-in sweep if omitted)")
+    compaction.add_argument('--top-k', type=int, default=100)
+    compaction.add_argument('--k', type=int, default=5)
+    compaction.set_defaults(run=bench_compaction)
+
+    suite = subparsers.add_parser('suite', help="Every engine through the engine interface: build time and memory, latency percentiles and throughput per user count")
+    suite.add_argument('--engines', nargs='+', choices=sorted(ENGINES), default=['tfidf', 'word2vec', 'bert'])
+    suite.add_argument('--users', type=int, nargs='+', default=[1, 5, 10, 20, 50])
+    suite.add_argument('--labels', help="evaluation.xlsx, whose judged profiles are used as test cases")
+    suite.add_argument('--top-k', type=int, default=100)
+    suite.set_defaults(run=bench_suite)
+
+    hybrid = subparsers.add_parser('hybrid', help="TF-IDF top-N re-ranked with dense vectors: Prec@K and latency side by side with TF-IDF")
+    hybrid.add_argument('--labels', help="Hand-judged evaluation.xlsx (Prec@K is skipped without it)")
+    hybrid.add_argument('--top-k', type=int, default=100, help="TF-IDF candidates re-ranked per query")
+    hybrid.add_argument('--k', type=int, default=5)
+    hybrid.add_argument('--dim', type=int, default=100)
+    hybrid.add_argument('--weights', type=float, nargs='+', default=[0.25, 0.5, 0.75])
+    hybrid.set_defaults(run=bench_hybrid)
+
+    embed = subparsers.add_parser('embed', help="Length-bucketed batched embedding with the content-hash store vs. one doc per call")
+    embed.add_argument('--docs', type=int, default=5000)
+    embed.add_argument('--batch-size', type=int, default=32)
+    embed.add_argument('--workers', type=int, default=1)
+    embed.add_argument('--call-overhead-tokens', type=int, default=0,
+                       help="Fixed work per encode call, in tokens; 0 models no per-call overhead")
+    embed.set_defaults(run=bench_embed)
+
+    word2vec = subparsers.add_parser('word2vec', help="Word2Vec document vectors: sparse token matrix x embedding table vs. the per-document loop")
+    word2vec.add_argument('--docs', type=int, default=49194)
+    word2vec.set_defaults(run=bench_word2vec)
+
+    sessions = subparsers.add_parser('sessions', help="Per-rerun latency and memory with concurrent sessions: cache_data copies vs. shared index")
+    sessions.add_argument('--sessions', type=int, default=20)
+    sessions.add_argument('--reruns', type=int, default=10)
+    sessions.set_defaults(run=bench_sessions)
+
+    pages = subparsers.add_parser('pages', help="Per-session result memory and page render cost: copied frame vs. row ids and scores")
+    pages.add_argument('--top-k', type=lambda value: None if value == 'all' else int(value), nargs='+', default=[100, None],
+                       help="Result sizes to compare ('all' keeps every match)")
+    pages.add_argument('--per-page', type=int, default=5)
+    pages.set_defaults(run=bench_pages)
+
+    load = subparsers.add_parser('load', help="Concurrent users: throughput, tail latency and memory against thread and process pool size")
+    load.add_argument('--labels', help="evaluation.xlsx, whose judged profiles are replayed (sample profiles otherwise)")
+    load.add_argument('--requests', type=int, default=200)
+    load.add_argument('--concurrency', type=int, nargs='+', default=[1, 2, 4, 8, 16, 32])
+    load.add_argument('--pools', nargs='+', choices=['threads', 'processes'], default=['threads', 'processes'])
+    load.add_argument('--filtered', action='store_true', help="Apply a work-type filter to every request")
+    load.set_defaults(run=bench_load)
+
+    trace = subparsers.add_parser('trace', help="Per-stage request tracing: overhead when off and on, and the stage breakdown")
+    trace.add_argument('--filtered', action='store_true', help="Apply a work-type filter to every request")
+    trace.set_defaults(run=bench_trace)
+
+    startup = subparsers.add_parser('startup', help="Time to first paint and to each index: both pipelines before the first page vs. background warm-up")
+    startup.set_defaults(run=bench_startup)
+
+    mirror = subparsers.add_parser('mirror', help="Dataset mirror against a local HTTP stand-in for the sheet export")
+    mirror.set_defaults(run=bench_mirror)
+
+    args = parser.parse_args()
+    print(json.dumps(args.run(args), indent=2))
+
+
+if __name__ == "__main__":
+    main()
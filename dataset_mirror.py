@@ -0,0 +1,173 @@
+import hashlib
+import http.client
+import json
+import os
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+
+# Local copies of the remote sheets and images. Each source lives in
+# MIRROR_DIR/<name>/ as a content-addressed data file plus meta.json holding
+# its sha256 and the HTTP validators. A warm mirror is always served straight
+# from disk; once a copy is older than refresh_seconds the remote is asked,
+# conditionally, in a background thread, and the data file is only replaced
+# when the content actually changed. Only a cold mirror waits on the network.
+MIRROR_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data_mirror')
+META_FILE = 'meta.json'
+DEFAULT_REFRESH_SECONDS = 15 * 60
+FETCH_ERRORS = (OSError, ValueError, http.client.HTTPException)
+
+
+class MirrorUnavailable(Exception):
+    pass
+
+
+class HttpRemote:
+    # A remote is anything with fetch(url, validators) -> (body, validators),
+    # where body is None when the remote reports the content unchanged.
+    def __init__(self, timeout=30):
+        self.timeout = timeout
+
+    def fetch(self, url, validators):
+        request = urllib.request.Request(url)
+        if validators.get('etag'):
+            request.add_header('If-None-Match', validators['etag'])
+        if validators.get('last_modified'):
+            request.add_header('If-Modified-Since', validators['last_modified'])
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                body = response.read()
+                headers = response.headers
+        except urllib.error.HTTPError as error:
+            if error.code == 304:
+                return None, validators
+            raise
+        return body, {'etag': headers.get('ETag'), 'last_modified': headers.get('Last-Modified')}
+
+
+class GdownRemote:
+    # Drive file links need gdown's confirmation handling and send no usable
+    # validators, so changes are detected from the content hash alone.
+    def fetch(self, url, validators):
+        import gdown
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = gdown.download(url, os.path.join(tmp, 'download'), quiet=True)
+            if path is None:
+                raise OSError(f"gdown could not download {url}")
+            with open(path, 'rb') as f:
+                return f.read(), {}
+
+
+class DatasetMirror:
+    def __init__(self, root=MIRROR_DIR, remote=None, refresh_seconds=DEFAULT_REFRESH_SECONDS, clock=time.time):
+        self.root = root
+        self.remote = remote or HttpRemote()
+        self.refresh_seconds = refresh_seconds
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.source_locks = {}
+        self.errors = {}
+
+    def source_lock(self, name):
+        with self.lock:
+            return self.source_locks.setdefault(name, threading.Lock())
+
+    def read_meta(self, name):
+        try:
+            with open(os.path.join(self.root, name, META_FILE)) as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if not os.path.isfile(os.path.join(self.root, name, meta.get('file', ''))):
+            return None
+        return meta
+
+    def get(self, name, url, remote=None):
+        # Returns (local path, sha256). The path changes whenever the content
+        # does, so it can be used directly as a cache key.
+        meta = self.read_meta(name)
+        if meta is None:
+            meta = self.refresh(name, url, remote)
+        elif self.clock() - meta.get('attempted_at', meta['checked_at']) >= self.refresh_seconds:
+            self.refresh_in_background(name, url, remote)
+        return os.path.join(self.root, name, meta['file']), meta['sha256']
+
+    def refresh(self, name, url, remote=None):
+        with self.source_lock(name):
+            return self.fetch_and_store(name, url, remote or self.remote)
+
+    def refresh_in_background(self, name, url, remote=None):
+        lock = self.source_lock(name)
+        if not lock.acquire(blocking=False):
+            return None
+
+        def run():
+            try:
+                self.fetch_and_store(name, url, remote or self.remote)
+            except MirrorUnavailable:
+                pass
+            finally:
+                lock.release()
+
+        thread = threading.Thread(target=run, name=f"mirror-refresh-{name}", daemon=True)
+        thread.start()
+        return thread
+
+    def fetch_and_store(self, name, url, remote):
+        meta = self.read_meta(name)
+        validators = {} if meta is None else {key: meta.get(key) for key in ('etag', 'last_modified')}
+        try:
+            body, validators = remote.fetch(url, validators)
+        except FETCH_ERRORS as error:
+            self.errors[name] = repr(error)
+            if meta is not None:
+                # Offline or failing remote: keep serving the copy we have, and
+                # note the attempt so the next one waits another refresh_seconds
+                meta['attempted_at'] = self.clock()
+                write_atomic(os.path.join(self.root, name, META_FILE), json.dumps(meta, indent=2).encode('utf-8'))
+                return meta
+            raise MirrorUnavailable(f"No local copy of {name} and {url} could not be fetched: {error}") from error
+
+        directory = os.path.join(self.root, name)
+        os.makedirs(directory, exist_ok=True)
+        now = self.clock()
+        stale_file = None
+        meta = dict(meta or {})
+        if body is not None:
+            digest = hashlib.sha256(body).hexdigest()
+            if digest != meta.get('sha256'):
+                stale_file = meta.get('file')
+                data_file = digest[:16] + os.path.splitext(name)[1]
+                write_atomic(os.path.join(directory, data_file), body)
+                meta.update(file=data_file, sha256=digest, size=len(body), changed_at=now)
+        meta.update(url=url, checked_at=now, attempted_at=now, etag=validators.get('etag'), last_modified=validators.get('last_modified'))
+        write_atomic(os.path.join(directory, META_FILE), json.dumps(meta, indent=2).encode('utf-8'))
+        if stale_file and stale_file != meta['file']:
+            # Readers that already opened the old file keep their handle
+            try:
+                os.remove(os.path.join(directory, stale_file))
+            except OSError:
+                pass
+        self.errors.pop(name, None)
+        return meta
+
+    def status(self):
+        status = {}
+        if os.path.isdir(self.root):
+            for name in sorted(os.listdir(self.root)):
+                meta = self.read_meta(name)
+                if meta is not None:
+                    status[name] = {key: meta.get(key) for key in ('sha256', 'size', 'changed_at', 'checked_at', 'attempted_at')}
+        for name, error in self.errors.items():
+            status.setdefault(name, {})['last_error'] = error
+        return status
+
+
+def write_atomic(path, payload):
+    tmp_path = f"{path}.tmp-{os.getpid()}-{threading.get_ident()}"
+    with open(tmp_path, 'wb') as f:
+        f.write(payload)
+    os.replace(tmp_path, path)
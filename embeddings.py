@@ -0,0 +1,217 @@
+import hashlib
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain, repeat
+
+import numpy as np
+import scipy.sparse as sp
+
+# Dense document embeddings computed once and kept on disk. Every text is
+# keyed by a hash of (model, text), so a refreshed sheet only embeds the
+# postings that are new or changed; everything else is read back from the
+# memory-mapped vector file.
+EMBEDDING_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'index_cache', 'embeddings')
+KEY_BYTES = 16
+DEFAULT_BATCH_SIZE = 32
+
+
+def text_key(text, model_name):
+    return hashlib.sha256(f"{model_name}\x00{text}".encode('utf-8', 'surrogatepass')).digest()[:KEY_BYTES]
+
+
+class EmbeddingStore:
+    # Append-only: vectors.f32 and keys.bin grow together, and manifest.json
+    # records how many rows are complete. A crash mid-append leaves a tail
+    # past that count, which is ignored and overwritten by the next append.
+    def __init__(self, path, model_name, dim, dtype=np.float32):
+        self.path = path
+        self.model_name = model_name
+        self.dim = dim
+        self.dtype = np.dtype(dtype)
+        self.lock = threading.Lock()
+        os.makedirs(path, exist_ok=True)
+        for name in ('vectors.f32', 'keys.bin'):
+            open(os.path.join(path, name), 'ab').close()
+        self.count = 0
+        manifest = self.read_manifest()
+        if manifest is not None and manifest['model_name'] == model_name and manifest['dim'] == dim:
+            self.count = manifest['count']
+        else:
+            # Different model or layout: start over
+            for name in ('vectors.f32', 'keys.bin'):
+                open(os.path.join(path, name), 'wb').close()
+            self.write_manifest()
+        self.positions = {key: i for i, key in enumerate(self.read_keys())}
+
+    def read_manifest(self):
+        try:
+            with open(os.path.join(self.path, 'manifest.json')) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def write_manifest(self):
+        tmp_path = os.path.join(self.path, f"manifest.json.tmp-{os.getpid()}")
+        with open(tmp_path, 'w') as f:
+            json.dump({'model_name': self.model_name, 'dim': self.dim, 'dtype': str(self.dtype), 'count': self.count}, f)
+        os.replace(tmp_path, os.path.join(self.path, 'manifest.json'))
+
+    def read_keys(self):
+        with open(os.path.join(self.path, 'keys.bin'), 'rb') as f:
+            raw = f.read(self.count * KEY_BYTES)
+        return [raw[i:i + KEY_BYTES] for i in range(0, len(raw), KEY_BYTES)]
+
+    def vectors(self):
+        if self.count == 0:
+            return np.empty((0, self.dim), dtype=self.dtype)
+        return np.memmap(os.path.join(self.path, 'vectors.f32'), dtype=self.dtype, mode='r', shape=(self.count, self.dim))
+
+    def add(self, keys, vectors):
+        vectors = np.ascontiguousarray(vectors, dtype=self.dtype).reshape(len(keys), self.dim)
+        with self.lock:
+            with open(os.path.join(self.path, 'vectors.f32'), 'r+b') as f:
+                f.seek(self.count * self.dim * self.dtype.itemsize)
+                f.write(vectors.tobytes())
+                f.truncate()
+            with open(os.path.join(self.path, 'keys.bin'), 'r+b') as f:
+                f.seek(self.count * KEY_BYTES)
+                f.write(b''.join(keys))
+                f.truncate()
+            for offset, key in enumerate(keys):
+                self.positions[key] = self.count + offset
+            self.count += len(keys)
+            self.write_manifest()
+
+    def get(self, keys):
+        # Rows in the order of keys; every key must be present
+        return np.asarray(self.vectors()[[self.positions[key] for key in keys]])
+
+
+def length_buckets(lengths, batch_size):
+    # Batches of documents with similar token counts, so padding to the
+    # longest document in a batch wastes little compute.
+    order = np.argsort(lengths, kind='stable')
+    return [order[start:start + batch_size] for start in range(0, len(order), batch_size)]
+
+
+def embed_corpus(texts, encoder, store, batch_size=DEFAULT_BATCH_SIZE, workers=1):
+    # Returns one vector per text, embedding only texts the store has not seen.
+    # encoder needs model_name, token_lengths(texts) and encode(texts). One
+    # worker by default: torch already spreads a batch over every core. With
+    # more workers, an encoder with share_cores(workers) splits the cores
+    # between them instead of running workers x cores threads.
+    keys = [text_key(text, encoder.model_name) for text in texts]
+    todo, queued = [], set()
+    for i, key in enumerate(keys):
+        if key not in store.positions and key not in queued:
+            todo.append(i)
+            queued.add(key)
+    stats = {'texts': len(texts), 'embedded': len(todo), 'batches': 0}
+    if todo:
+        todo_texts = [texts[i] for i in todo]
+        batches = length_buckets(np.asarray(encoder.token_lengths(todo_texts)), batch_size)
+        stats['batches'] = len(batches)
+
+        def run(batch):
+            return batch, encoder.encode([todo_texts[i] for i in batch])
+
+        workers = workers or 1
+        if workers > 1 and hasattr(encoder, 'share_cores'):
+            encoder.share_cores(workers)
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for batch, vectors in pool.map(run, batches):
+                store.add([keys[todo[i]] for i in batch], vectors)
+    return store.get(keys), stats
+
+
+class BertEncoder:
+    # Mean-pooled last hidden state, as get_bert_embedding in the notebooks,
+    # but over a padded batch: the mean only counts real tokens (attention
+    # mask), so each vector matches embedding the document on its own.
+    def __init__(self, model_name='bert-base-uncased', max_length=512, threads_per_worker=None):
+        import torch
+        from transformers import AutoModel, AutoTokenizer
+
+        self.torch = torch
+        self.model_name = model_name
+        self.max_length = max_length
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+        self.model = AutoModel.from_pretrained(model_name).eval()
+        self.dim = self.model.config.hidden_size
+        if threads_per_worker:
+            torch.set_num_threads(threads_per_worker)
+
+    def share_cores(self, workers):
+        # torch's intra-op thread pool is process-wide, so each of the workers
+        # calling encode at once gets an equal share of the cores
+        self.torch.set_num_threads(max(1, (os.cpu_count() or 1) // workers))
+
+    def token_lengths(self, texts):
+        encoded = self.tokenizer(list(texts), truncation=True, max_length=self.max_length)
+        return [len(ids) for ids in encoded['input_ids']]
+
+    def encode(self, texts):
+        inputs = self.tokenizer(list(texts), return_tensors='pt', truncation=True, padding=True, max_length=self.max_length)
+        with self.torch.no_grad():
+            hidden = self.model(**inputs).last_hidden_state
+        mask = inputs['attention_mask'].unsqueeze(-1).to(hidden.dtype)
+        return ((hidden * mask).sum(dim=1) / mask.sum(dim=1)).numpy()
+
+
+class Word2VecEncoder:
+    # Mean of the word vectors of a document's in-vocabulary tokens, as
+    # get_document_vector in the Word2Vec notebooks, for a whole corpus at once:
+    # a sparse token matrix over the vocabulary times the embedding table.
+    # Tokens are kept in document order and duplicates are not merged, so the
+    # product adds the same float32 vectors in the same order as np.mean over
+    # the per-word list, and the vectors come out bit for bit the same.
+    def __init__(self, words, vectors, tokenizer=None, model_name='word2vec'):
+        if tokenizer is None:
+            from nltk.tokenize import word_tokenize as tokenizer
+        self.tokenizer = tokenizer
+        self.model_name = model_name
+        self.vocabulary = {word: i for i, word in enumerate(words)}
+        self.vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        self.dim = self.vectors.shape[1]
+
+    @classmethod
+    def from_model(cls, model, tokenizer=None, model_name='word2vec'):
+        # A trained gensim Word2Vec model (or its KeyedVectors)
+        wv = getattr(model, 'wv', model)
+        return cls(wv.index_to_key, wv.vectors, tokenizer, model_name)
+
+    def tokenize(self, texts):
+        return [self.tokenizer(text) for text in texts]
+
+    def token_lengths(self, texts):
+        return [len(tokens) for tokens in self.tokenize(texts)]
+
+    def token_matrix(self, token_lists):
+        # One stored entry per in-vocabulary token; the word lookups run in a
+        # single map over all tokens rather than a Python loop per document
+        lengths = np.fromiter(map(len, token_lists), dtype=np.int64, count=len(token_lists))
+        ids = np.fromiter(map(self.vocabulary.get, chain.from_iterable(token_lists), repeat(-1)),
+                          dtype=np.int32, count=int(lengths.sum()))
+        known = ids >= 0
+        indptr = np.zeros(len(token_lists) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(np.repeat(np.arange(len(token_lists)), lengths)[known], minlength=len(token_lists)),
+                  out=indptr[1:])
+        return sp.csr_matrix((np.ones(int(known.sum()), dtype=np.float32), ids[known], indptr),
+                             shape=(len(token_lists), len(self.vocabulary)))
+
+    def encode_tokens(self, token_lists):
+        # For corpora already tokenized for training (the notebooks' Tokenized
+        # column); documents with no known word get the zero vector
+        counts = self.token_matrix(token_lists)
+        lengths = np.diff(counts.indptr).astype(np.float32)
+        sums = counts @ self.vectors
+        np.divide(sums, lengths[:, None], out=sums, where=lengths[:, None] > 0)
+        return sums
+
+    def encode(self, texts):
+        return self.encode_tokens(self.tokenize(texts))
+
+    def encode_query(self, text):
+        return self.encode([text])[0]
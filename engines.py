@@ -0,0 +1,286 @@
+import os
+from functools import partial
+
+import numpy as np
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+from ann_index import IVFIndex, normalize_rows
+from embeddings import EMBEDDING_DIR, BertEncoder, EmbeddingStore, Word2VecEncoder, embed_corpus
+from facets import filter_rows
+from inverted_index import InvertedIndex
+from recommender import (COURSE_PERCENTILE, DEFAULT_TOP_K, batch_scores, course_filters, job_filters, match_rows,
+                         matched_candidates, preprocess_text_simple, recommend_course, recommend_job, score_rows,
+                         select_courses, select_jobs, top_k_indices)
+from tfidf_index import INDEX_DIR, TFIDF_DTYPE, build_or_load_index
+from tracing import span
+
+# One interface for the three retrieval methods the notebooks compare:
+#   fit(texts)                  index a corpus (already normalised, as the TF-IDF index gets it)
+#   load(...)                   reopen a saved index (dense engines: None when it is missing or stale)
+#   query(text, top_k, rows)    (row ids, scores) of the best rows, optionally within rows
+#   batch_query(texts, ...)     the same for many profiles at once
+# recommend_job / recommend_course apply the app's filters and thresholds to
+# any engine. Every engine preprocesses queries with
+# recommender.preprocess_text_simple, so the methods compare on the same
+# text; the course notebooks' extra digit stripping is not applied.
+# Clusters an IVF query probes; more probes trade latency for recall
+DEFAULT_N_PROBE = 16
+
+
+class Engine:
+    name = None
+
+    def fit(self, texts):
+        raise NotImplementedError
+
+    def scores(self, user_input, rows=None):
+        # One cosine score per row (per given row when rows is set)
+        raise NotImplementedError
+
+    def match(self, user_input):
+        scores = self.scores(user_input)
+        matched = np.flatnonzero(scores > 0)
+        return matched, scores[matched]
+
+    def query(self, user_input, top_k=DEFAULT_TOP_K, rows=None, min_score=0.0):
+        scores = self.scores(user_input, rows)
+        ids = np.arange(len(scores)) if rows is None else np.asarray(rows)
+        keep = scores > min_score
+        return top_k_indices(ids[keep], scores[keep], top_k)
+
+    def batch_query(self, profiles, top_k=DEFAULT_TOP_K, rows=None):
+        return [self.query(profile, top_k, rows) for profile in profiles]
+
+    def candidates(self, user_input, percentile=None):
+        # As recommender.query_candidates: the rows facet counts are taken over
+        matched, matched_scores = self.match(user_input)
+        if percentile is not None and len(matched):
+            matched = matched[matched_scores >= np.percentile(matched_scores, percentile)]
+        return np.sort(matched).astype(np.int32)
+
+    def recommend_job(self, user_input, df, experience_levels=None, work_types=None, name=None, country=None,
+                      top_k=DEFAULT_TOP_K, min_score=0.0, facets=None, reranker=None, lazy=False, with_candidates=False):
+        with span('filters'):
+            candidates = filter_rows(df, facets, job_filters(experience_levels, work_types, name, country))
+        if candidates is not None and len(candidates) == 0:
+            return (None, candidates) if with_candidates else None
+        with span('score'):
+            scores = self.scores(user_input, candidates)
+        if candidates is None:
+            candidates = np.arange(len(scores))
+        rerank = None if reranker is None else partial(reranker.rerank, user_input)
+        result = select_jobs(df, candidates, scores, top_k, min_score, rerank, lazy)
+        if not with_candidates:
+            return result
+        return result, matched_candidates(candidates[scores > 0])
+
+    def recommend_course(self, user_input, df, selected_sites=None, selected_subtitle=None,
+                         top_k=DEFAULT_TOP_K, min_score=0.0, facets=None, reranker=None, lazy=False, with_candidates=False):
+        with span('score'):
+            matched, matched_scores = self.match(user_input)
+        with span('filters'):
+            filtered = filter_rows(df, facets, course_filters(selected_sites, selected_subtitle))
+        rerank = None if reranker is None else partial(reranker.rerank, user_input)
+        result = select_courses(df, matched, matched_scores, filtered, top_k, min_score, rerank, lazy)
+        if not with_candidates:
+            return result
+        return result, matched_candidates(matched, matched_scores, COURSE_PERCENTILE)
+
+
+class TfidfEngine(Engine):
+    # The serving engine; index is an optional InvertedIndex
+    name = 'tfidf'
+
+    def __init__(self, vectorizer=None, tfidf_matrix=None, index=None):
+        self.vectorizer = vectorizer
+        self.tfidf_matrix = tfidf_matrix
+        self.index = index
+
+    def fit(self, texts, stop_words='english'):
+        self.vectorizer = TfidfVectorizer(stop_words=stop_words, dtype=TFIDF_DTYPE)
+        self.tfidf_matrix = self.vectorizer.fit_transform(texts)
+        return self
+
+    @classmethod
+    def load(cls, name, source_hash, row_ids, build_corpus, inverted=False, compaction=None, index_dir=INDEX_DIR):
+        # The on-disk snapshot for this source version, fitted only on a miss
+        vectorizer, tfidf_matrix = build_or_load_index(name, source_hash, row_ids, build_corpus, index_dir=index_dir,
+                                                       compaction=compaction)
+        return cls(vectorizer, tfidf_matrix, InvertedIndex(tfidf_matrix) if inverted else None)
+
+    def encode(self, user_input):
+        return self.vectorizer.transform([preprocess_text_simple(user_input)])
+
+    def scores(self, user_input, rows=None):
+        return score_rows(self.encode(user_input), self.tfidf_matrix, rows)
+
+    def match(self, user_input):
+        return match_rows(self.encode(user_input), self.tfidf_matrix, self.index)
+
+    def query(self, user_input, top_k=DEFAULT_TOP_K, rows=None, min_score=0.0):
+        if self.index is None:
+            return super().query(user_input, top_k, rows, min_score)
+        ids, scores = self.index.search(self.encode(user_input), top_k, min_score, rows=rows)
+        keep = scores > min_score
+        return top_k_indices(ids[keep], scores[keep], top_k)
+
+    def batch_query(self, profiles, top_k=DEFAULT_TOP_K, rows=None, chunk_size=64):
+        results = [None] * len(profiles)
+        for position, ids, scores in batch_scores(profiles, self.vectorizer, self.tfidf_matrix, chunk_size):
+            if rows is not None:
+                in_rows = np.isin(ids, rows)
+                ids, scores = ids[in_rows], scores[in_rows]
+            keep = scores > 0
+            results[position] = top_k_indices(ids[keep], scores[keep], top_k)
+        return results
+
+    def recommend_job(self, user_input, df, experience_levels=None, work_types=None, name=None, country=None,
+                      top_k=DEFAULT_TOP_K, min_score=0.0, facets=None, reranker=None, lazy=False, with_candidates=False):
+        return recommend_job(user_input, df, self.vectorizer, self.tfidf_matrix, experience_levels, work_types, name,
+                             country, top_k, min_score, facets, self.index, reranker, lazy, with_candidates)
+
+    def recommend_course(self, user_input, df, selected_sites=None, selected_subtitle=None,
+                         top_k=DEFAULT_TOP_K, min_score=0.0, facets=None, reranker=None, lazy=False, with_candidates=False):
+        return recommend_course(user_input, df, self.vectorizer, self.tfidf_matrix, selected_sites, selected_subtitle,
+                                top_k, min_score, facets, self.index, reranker, lazy, with_candidates)
+
+
+class DenseEngine(Engine):
+    # Cosine over one dense vector per document, served from an IVF index
+    # (ann_index.IVFIndex): rows are normalised once and grouped by cluster,
+    # so a query multiplies only the slices of its closest clusters, and a
+    # filtered query probes clusters and drops rows outside the filter. Only
+    # small candidate sets are scored exhaustively (IVFIndex.search decides).
+    def __init__(self, encoder=None, doc_vectors=None, n_probe=DEFAULT_N_PROBE):
+        self.encoder = encoder
+        self.n_probe = n_probe
+        self.index = None if doc_vectors is None else IVFIndex.build(doc_vectors, n_probe=n_probe)
+
+    def fit(self, texts):
+        self.index = IVFIndex.build(self.encoder.encode(list(texts)), n_probe=self.n_probe)
+        return self
+
+    def save(self, path):
+        os.makedirs(path, exist_ok=True)
+        self.index.save(os.path.join(path, 'ivf'))
+        return path
+
+    @classmethod
+    def load(cls, path, encoder, mmap=True):
+        # The grouped vectors are memory-mapped and already normalised.
+        # None when the index is missing or stale, so the caller refits
+        engine = cls(encoder)
+        return engine.attach_index(path, mmap)
+
+    def attach_index(self, path, mmap=True):
+        # Saves from before the IVF index keep doc_vectors.npy, which the
+        # index is rebuilt from (and saved) on first load
+        self.index = IVFIndex.load(os.path.join(path, 'ivf'), mmap)
+        vectors_file = os.path.join(path, 'doc_vectors.npy')
+        if self.index is None and os.path.isfile(vectors_file):
+            self.index = IVFIndex.build(np.load(vectors_file), n_probe=self.n_probe)
+            self.index.save(os.path.join(path, 'ivf'))
+        if self.index is None:
+            return None
+        self.n_probe = self.index.n_probe
+        return self
+
+    def query_vectors(self, profiles):
+        return normalize_rows(self.encoder.encode([preprocess_text_simple(profile) for profile in profiles]))
+
+    def scores(self, user_input, rows=None):
+        # Every row's score, for the percentile cut-off and facet counts: one
+        # product over the grouped vectors, scattered back to row order
+        scores = np.empty(self.index.n_docs, dtype=np.float32)
+        scores[self.index.ids] = self.index.vectors @ self.query_vectors([user_input])[0]
+        return scores if rows is None else scores[rows]
+
+    def query(self, user_input, top_k=DEFAULT_TOP_K, rows=None, min_score=0.0):
+        if top_k is None:
+            return super().query(user_input, top_k, rows, min_score)
+        ids, scores = self.index.search(self.query_vectors([user_input])[0], top_k, rows)
+        keep = scores > min_score
+        return top_k_indices(ids[keep], scores[keep], top_k)
+
+    def batch_query(self, profiles, top_k=DEFAULT_TOP_K, rows=None):
+        # Profiles are encoded in one call, then each probes the index
+        results = []
+        for vector in self.query_vectors(profiles):
+            ids, scores = self.index.search(vector, top_k, rows)
+            keep = scores > 0
+            results.append(top_k_indices(ids[keep], scores[keep], top_k))
+        return results
+
+    def recommend_job(self, user_input, df, experience_levels=None, work_types=None, name=None, country=None,
+                      top_k=DEFAULT_TOP_K, min_score=0.0, facets=None, reranker=None, lazy=False, with_candidates=False):
+        # Candidates need every row's score, which the probed search does not give
+        if top_k is None or with_candidates:
+            return super().recommend_job(user_input, df, experience_levels, work_types, name, country, top_k, min_score,
+                                         facets, reranker, lazy, with_candidates)
+        with span('filters'):
+            candidates = filter_rows(df, facets, job_filters(experience_levels, work_types, name, country))
+        if candidates is not None and len(candidates) == 0:
+            return None
+        with span('score'):
+            ids, scores = self.index.search(self.query_vectors([user_input])[0], top_k, candidates)
+        rerank = None if reranker is None else partial(reranker.rerank, user_input)
+        return select_jobs(df, ids, scores, top_k, min_score, rerank, lazy)
+
+
+class Word2VecEngine(DenseEngine):
+    # Same model settings as the notebooks (vector_size=100, window=5, min_count=1)
+    name = 'word2vec'
+
+    def __init__(self, encoder=None, doc_vectors=None, tokenizer=None, n_probe=DEFAULT_N_PROBE):
+        super().__init__(encoder, doc_vectors, n_probe)
+        self.tokenizer = tokenizer
+
+    def fit(self, texts, vector_size=100, window=5, min_count=1, workers=4, seed=1):
+        from gensim.models import Word2Vec
+
+        tokenizer = self.tokenizer
+        if tokenizer is None:
+            from nltk.tokenize import word_tokenize as tokenizer
+        tokens = [tokenizer(text) for text in texts]
+        model = Word2Vec(sentences=tokens, vector_size=vector_size, window=window, min_count=min_count,
+                         workers=workers, seed=seed)
+        self.encoder = Word2VecEncoder.from_model(model, tokenizer)
+        self.index = IVFIndex.build(self.encoder.encode_tokens(tokens), n_probe=self.n_probe)
+        return self
+
+    def save(self, path):
+        super().save(path)
+        words = np.array(list(self.encoder.vocabulary), dtype=str)
+        np.save(os.path.join(path, 'words.npy'), words)
+        np.save(os.path.join(path, 'word_vectors.npy'), self.encoder.vectors)
+        return path
+
+    @classmethod
+    def load(cls, path, tokenizer=None, mmap=True):
+        encoder = Word2VecEncoder(np.load(os.path.join(path, 'words.npy')).tolist(),
+                                  np.load(os.path.join(path, 'word_vectors.npy')), tokenizer)
+        engine = cls(encoder, tokenizer=tokenizer)
+        return engine.attach_index(path, mmap)
+
+
+class BertEngine(DenseEngine):
+    # Document vectors go through the content-hash store, so refitting on a
+    # refreshed sheet only embeds the new or edited texts
+    name = 'bert'
+
+    def __init__(self, encoder=None, doc_vectors=None, model_name='bert-base-uncased', store_dir=EMBEDDING_DIR,
+                 n_probe=DEFAULT_N_PROBE):
+        super().__init__(encoder, doc_vectors, n_probe)
+        self.model_name = model_name
+        self.store_dir = store_dir
+
+    def fit(self, texts, batch_size=32):
+        if self.encoder is None:
+            self.encoder = BertEncoder(self.model_name)
+        store = EmbeddingStore(os.path.join(self.store_dir, self.name), self.encoder.model_name, self.encoder.dim)
+        vectors, _ = embed_corpus(list(texts), self.encoder, store, batch_size)
+        self.index = IVFIndex.build(vectors, n_probe=self.n_probe)
+        return self
+
+
+ENGINES = {'tfidf': TfidfEngine, 'word2vec': Word2VecEngine, 'bert': BertEngine}
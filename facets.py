@@ -0,0 +1,89 @@
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+
+
+class Facet:
+    # Row ids grouped by value: rows[offsets[i]:offsets[i + 1]] are the rows
+    # whose column equals values[i], in ascending row order. Missing values
+    # get code -1 and never match a filter, same as isin/==/str.contains.
+    # With a separator the column holds lists like "English, French": tokens
+    # are the distinct list items, and token_values[t, v] marks the values
+    # that contain token t, the same substring test the filter applies.
+    def __init__(self, column, separator=None):
+        codes, values = pd.factorize(column, use_na_sentinel=True)
+        self.codes = codes.astype(np.int32)
+        self.values = pd.Index(values)
+        counts = np.bincount(self.codes[self.codes >= 0], minlength=len(self.values))
+        n_missing = len(self.codes) - int(counts.sum())
+        self.rows = np.argsort(self.codes, kind='stable').astype(np.int32)[n_missing:]
+        self.offsets = np.concatenate([[0], np.cumsum(counts)])
+        self.sorted_values = self.values.sort_values()
+        self.tokens = None
+        if separator is not None:
+            values = pd.Series(self.values.astype(str), dtype=object)
+            self.tokens = pd.Index(sorted({token.strip() for value in values for token in value.split(separator)} - {''}))
+            self.token_values = sp.csr_matrix(np.array(
+                [values.str.contains(token, regex=False).to_numpy() for token in self.tokens], dtype=np.int32,
+            ).reshape(len(self.tokens), len(self.values)))
+
+    def counts(self, rows=None):
+        # Rows per value among rows (all rows when None)
+        codes = self.codes if rows is None else self.codes[rows]
+        return pd.Series(np.bincount(codes[codes >= 0], minlength=len(self.values)), index=self.values)
+
+    def token_counts(self, rows=None):
+        return pd.Series(self.token_values @ self.counts(rows).to_numpy(), index=self.tokens)
+
+    def rows_for_codes(self, codes):
+        if len(codes) == 0:
+            return np.empty(0, dtype=np.int32)
+        if len(codes) == 1:
+            code = codes[0]
+            return self.rows[self.offsets[code]:self.offsets[code + 1]]
+        return np.sort(np.concatenate([self.rows[self.offsets[c]:self.offsets[c + 1]] for c in codes]))
+
+    def rows_where(self, predicate):
+        # The predicate sees each distinct value once instead of every row
+        matched = np.asarray(predicate(self.values), dtype=bool)
+        return self.rows_for_codes(np.flatnonzero(matched))
+
+
+def build_facet_index(df, columns, separators=None):
+    separators = separators or {}
+    return {column: Facet(df[column], separators.get(column)) for column in columns}
+
+
+def filter_rows(df, facets, selections):
+    # selections is a list of (column, predicate) pairs that are ANDed together.
+    # Returns sorted candidate row positions, or None when nothing is filtered.
+    if not selections:
+        return None
+    row_sets = []
+    for column, predicate in selections:
+        if facets is not None and column in facets:
+            row_sets.append(facets[column].rows_where(predicate))
+        else:
+            row_sets.append(np.flatnonzero(np.asarray(predicate(df[column]), dtype=bool)).astype(np.int32))
+    row_sets.sort(key=len)
+    rows = row_sets[0]
+    for other in row_sets[1:]:
+        if len(rows) == 0:
+            break
+        rows = np.intersect1d(rows, other, assume_unique=True)
+    return rows
+
+
+def facet_counts(facets, selections, rows=None):
+    # Per-value counts for every facet over rows (all rows when None). Each
+    # facet is counted under the other facets' selections only, so its options
+    # show how many rows choosing them would leave.
+    selected = {column: facets[column].rows_where(predicate) for column, predicate in selections if column in facets}
+    counts = {}
+    for column, facet in facets.items():
+        candidates = rows
+        for other, other_rows in selected.items():
+            if other != column:
+                candidates = other_rows if candidates is None else np.intersect1d(candidates, other_rows, assume_unique=True)
+        counts[column] = facet.counts(candidates) if facet.tokens is None else facet.token_counts(candidates)
+    return counts
@@ -0,0 +1,92 @@
+import json
+import os
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.ipc as ipc
+
+# Cleaned frames persisted as uncompressed Arrow IPC files next to the index
+# snapshots, keyed by the same source hash. The file is memory-mapped, so
+# opening it costs no reads; only the columns asked for are decoded into
+# pandas, and single cells can be read without decoding their column at all.
+FRAME_FORMAT_VERSION = 1
+FRAME_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'index_cache', 'frames')
+
+
+def frame_path(name, source_hash, frame_dir=FRAME_DIR):
+    return os.path.join(frame_dir, name, f"v{FRAME_FORMAT_VERSION}-{source_hash[:16]}.arrow")
+
+
+def save_frame(name, source_hash, df, frame_dir=FRAME_DIR):
+    path = frame_path(name, source_hash, frame_dir)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    table = pa.Table.from_pandas(df, preserve_index=True)
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    with pa.OSFile(tmp_path, 'wb') as sink, ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+    os.replace(tmp_path, path)
+    for entry in os.listdir(os.path.dirname(path)):
+        stale = os.path.join(os.path.dirname(path), entry)
+        if stale != path:
+            try:
+                os.remove(stale)
+            except OSError:
+                pass
+    return path
+
+
+def load_frame(name, source_hash, frame_dir=FRAME_DIR):
+    path = frame_path(name, source_hash, frame_dir)
+    if not os.path.isfile(path):
+        return None
+    try:
+        return ColumnarFrame(ipc.open_file(pa.memory_map(path, 'r')).read_all(), path)
+    except (OSError, ValueError, pa.ArrowException):
+        return None
+
+
+def build_or_load_frame(name, source_hash, build_frame, frame_dir=FRAME_DIR):
+    # build_frame is only called on a miss, so the CSV is not parsed at all on a hit
+    frame = load_frame(name, source_hash, frame_dir)
+    if frame is not None:
+        return frame
+    df = build_frame()
+    try:
+        save_frame(name, source_hash, df, frame_dir)
+    except OSError:
+        # Serve from memory when the cache directory cannot be written
+        return ColumnarFrame(pa.Table.from_pandas(df, preserve_index=True))
+    return load_frame(name, source_hash, frame_dir)
+
+
+class ColumnarFrame:
+    def __init__(self, table, path=None):
+        self.path = path
+        self.table = table
+        metadata = json.loads(self.table.schema.metadata[b'pandas'])
+        index = metadata['index_columns'][0]
+        # A RangeIndex is stored as metadata only, any other index as a column
+        self.index_columns = [index] if isinstance(index, str) else []
+        self.columns = [column for column in self.table.column_names if column not in self.index_columns]
+        if self.index_columns:
+            self.index = pd.Index(self.table.column(index).to_numpy())
+        else:
+            self.index = pd.RangeIndex(index['start'], index['stop'], index['step'])
+
+    def __len__(self):
+        return self.table.num_rows
+
+    def to_pandas(self, columns=None):
+        columns = self.columns if columns is None else list(columns)
+        return self.table.select(self.index_columns + columns).to_pandas()
+
+    def value(self, column, label):
+        # One cell by index label, read straight from the mapped file
+        position = self.index.get_loc(label)
+        return self.table.column(column)[position].as_py()
+
+    def values(self, column, labels):
+        # Scalar reads only touch the pages holding those rows; take() would
+        # scan the whole column.
+        array = self.table.column(column)
+        return [array[position].as_py() for position in self.index.get_indexer(labels).tolist()]
@@ -0,0 +1,55 @@
+import os
+
+import numpy as np
+
+from ann_index import normalize_rows
+from embeddings import EMBEDDING_DIR, EmbeddingStore, embed_corpus, text_key
+from recommender import preprocess_text_simple, top_k_indices
+
+# Hybrid ranking: TF-IDF picks the top N rows as usual, then only those N are
+# re-ordered by a blend of their TF-IDF cosine and the cosine between
+# precomputed dense document vectors (BERT, Word2Vec) and the encoded query.
+# The dense side costs one query encoding and N dot products, so latency stays
+# close to TF-IDF alone however slow the dense model is over a whole corpus.
+DEFAULT_DENSE_WEIGHT = 0.5
+
+
+class DenseReranker:
+    # doc_vectors may be a memory-mapped store; positions maps a row id to its
+    # row in doc_vectors when the two are not in the same order.
+    # Norms are taken once here, so a query reads only its N candidate rows
+    # and never re-normalises a copy of them.
+    def __init__(self, doc_vectors, encoder, weight=DEFAULT_DENSE_WEIGHT, positions=None):
+        self.doc_vectors = doc_vectors
+        self.encoder = encoder
+        self.weight = weight
+        self.positions = positions
+        self.norms = np.linalg.norm(doc_vectors, axis=1).astype(np.float32)
+        self.norms[self.norms == 0] = 1.0
+
+    def query_vector(self, user_input):
+        return normalize_rows(self.encoder.encode([preprocess_text_simple(user_input)])).ravel()
+
+    def dense_scores(self, user_input, rows):
+        rows = np.asarray(rows)
+        if self.positions is not None:
+            rows = self.positions[rows]
+        return (self.doc_vectors[rows] @ self.query_vector(user_input)) / self.norms[rows]
+
+    def rerank(self, user_input, rows, scores, weight=None):
+        # Blended score = (1 - weight) * TF-IDF cosine + weight * dense cosine;
+        # weight 0 keeps the TF-IDF order
+        weight = self.weight if weight is None else weight
+        if len(rows) == 0 or weight == 0:
+            return rows, scores
+        blended = (1 - weight) * scores + weight * self.dense_scores(user_input, rows)
+        return top_k_indices(np.asarray(rows), blended.astype(np.float32))
+
+
+def build_reranker(name, texts, encoder, weight=DEFAULT_DENSE_WEIGHT, store_dir=EMBEDDING_DIR, batch_size=32):
+    # Vectors come from the content-hash store, so only new or edited texts
+    # are embedded; the reranker reads them from the mapped file.
+    store = EmbeddingStore(os.path.join(store_dir, name), encoder.model_name, encoder.dim)
+    embed_corpus(texts, encoder, store, batch_size)
+    positions = np.array([store.positions[text_key(text, encoder.model_name)] for text in texts], dtype=np.int64)
+    return DenseReranker(store.vectors(), encoder, weight, positions)
@@ -0,0 +1,185 @@
+import argparse
+import os
+import shutil
+import tempfile
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import scipy.sparse as sp
+from sklearn.feature_extraction.text import CountVectorizer
+
+from index_compaction import compact_index, compaction_setting, df_arg
+from ingestion import job_document_chunks
+from text_normalization import normalize_text_column
+from tfidf_index import (INDEX_DIR, TFIDF_DTYPE, file_content_hash, load_index, new_snapshot, publish_snapshot, save_index,
+                         write_manifest)
+
+# Builds the same snapshot as TfidfVectorizer(stop_words=...).fit_transform,
+# but one chunk of documents at a time across a process pool:
+#   1. count:  each worker tokenizes a chunk and writes its term counts to a
+#              shard on disk, returning only the chunk's vocabulary and
+#              document frequencies;
+#   2. merge:  the parent merges document frequencies, sorts the vocabulary
+#              and computes the IDF weights once;
+#   3. weight: each worker remaps its shard onto the global vocabulary,
+#              applies IDF and L2 normalisation and writes the final rows;
+#   4. concat: the parent streams the weighted shards into the snapshot's
+#              memory-mapped CSR arrays.
+# Only a bounded number of chunks are in flight, so peak memory depends on
+# chunk size and worker count, not on corpus size.
+DEFAULT_CHUNK_DOCS = 5000
+
+
+def count_chunk(chunk_id, texts, work_dir, stop_words, normalize):
+    if normalize:
+        texts = normalize_text_column(texts)
+    counter = CountVectorizer(stop_words=stop_words, dtype=np.int32)
+    try:
+        counts = counter.fit_transform(texts)
+        terms = counter.get_feature_names_out().astype(str)
+    except ValueError:
+        # Chunk with no tokens at all (empty documents or only stop words)
+        counts = sp.csr_matrix((len(texts), 0), dtype=np.int32)
+        terms = np.empty(0, dtype=str)
+    counts.sort_indices()
+    np.savez(
+        os.path.join(work_dir, f"counts-{chunk_id}.npz"),
+        data=counts.data, indices=counts.indices, indptr=counts.indptr, terms=terms,
+        row_ids=np.asarray(texts.index, dtype=np.int64),
+    )
+    doc_freq = np.bincount(counts.indices, minlength=len(terms))
+    return chunk_id, counts.shape[0], terms.tolist(), doc_freq.tolist()
+
+
+def weight_chunk(chunk_id, work_dir):
+    shard = np.load(os.path.join(work_dir, f"counts-{chunk_id}.npz"))
+    global_terms = np.load(os.path.join(work_dir, 'terms.npy'), mmap_mode='r')
+    idf = np.load(os.path.join(work_dir, 'idf.npy'), mmap_mode='r')
+
+    columns = np.searchsorted(global_terms, shard['terms']).astype(np.int32)
+    indptr = shard['indptr']
+    indices = columns[shard['indices']]
+    data = shard['data'].astype(np.float64) * idf[indices]
+
+    weighted = sp.csr_matrix((data, indices, indptr), shape=(len(indptr) - 1, len(global_terms)))
+    weighted.sort_indices()
+    norms = np.sqrt(np.asarray(weighted.multiply(weighted).sum(axis=1)).ravel())
+    norms[norms == 0] = 1.0
+    weighted.data /= np.repeat(norms, np.diff(weighted.indptr))
+    np.savez(
+        os.path.join(work_dir, f"weighted-{chunk_id}.npz"),
+        data=weighted.data.astype(TFIDF_DTYPE), indices=weighted.indices, row_nnz=np.diff(weighted.indptr),
+    )
+    return chunk_id, weighted.nnz
+
+
+def run_bounded(pool, fn, jobs, max_in_flight):
+    # Submits jobs lazily so at most max_in_flight chunks sit in memory, and
+    # yields each result in submission order as soon as it is ready
+    pending = []
+    for job in jobs:
+        pending.append(pool.submit(fn, *job))
+        if len(pending) >= max_in_flight:
+            yield pending.pop(0).result()
+    for future in pending:
+        yield future.result()
+
+
+def build_index(name, source_hash, chunks, workers=None, stop_words='english', normalize=True, index_dir=INDEX_DIR):
+    # chunks yields pd.Series of documents indexed by row id, in row order
+    workers = workers or os.cpu_count() or 1
+    work_dir = tempfile.mkdtemp(prefix=f"{name}-build-", dir=index_dir if os.path.isdir(index_dir) else None)
+    timings = {}
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            start = time.perf_counter()
+            count_jobs = ((chunk_id, texts, work_dir, stop_words, normalize) for chunk_id, texts in enumerate(chunks))
+            # Each chunk's vocabulary is folded into the global document
+            # frequencies as it arrives and then dropped, so the parent holds
+            # one merged vocabulary, not every chunk's term list
+            doc_freq = Counter()
+            n_docs = 0
+            chunk_ids = []
+            for chunk_id, chunk_docs, terms, freqs in run_bounded(pool, count_chunk, count_jobs, 2 * workers):
+                doc_freq.update(dict(zip(terms, freqs)))
+                n_docs += chunk_docs
+                chunk_ids.append(chunk_id)
+            timings['count_s'] = time.perf_counter() - start
+
+            start = time.perf_counter()
+            global_terms = np.array(sorted(doc_freq), dtype=str)
+            df_array = np.array([doc_freq[term] for term in global_terms.tolist()], dtype=np.float64)
+            # Same smoothed IDF as TfidfTransformer(smooth_idf=True)
+            idf = np.log((1 + n_docs) / (1 + df_array)) + 1
+            np.save(os.path.join(work_dir, 'terms.npy'), global_terms)
+            np.save(os.path.join(work_dir, 'idf.npy'), idf)
+            timings['merge_s'] = time.perf_counter() - start
+
+            start = time.perf_counter()
+            weight_jobs = ((chunk_id, work_dir) for chunk_id in sorted(chunk_ids))
+            weighted = sorted(run_bounded(pool, weight_chunk, weight_jobs, 2 * workers))
+            timings['weight_s'] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        os.makedirs(index_dir, exist_ok=True)
+        tmp_path, final_path = new_snapshot(name, source_hash, index_dir)
+        nnz = sum(n for _, n in weighted)
+        index_dtype = np.int32 if nnz < np.iinfo(np.int32).max else np.int64
+        data = np.lib.format.open_memmap(os.path.join(tmp_path, 'data.npy'), mode='w+', dtype=TFIDF_DTYPE, shape=(nnz,))
+        indices = np.lib.format.open_memmap(os.path.join(tmp_path, 'indices.npy'), mode='w+', dtype=index_dtype, shape=(nnz,))
+        indptr = np.lib.format.open_memmap(os.path.join(tmp_path, 'indptr.npy'), mode='w+', dtype=index_dtype, shape=(n_docs + 1,))
+        row_ids = np.lib.format.open_memmap(os.path.join(tmp_path, 'row_ids.npy'), mode='w+', dtype=np.int64, shape=(n_docs,))
+        indptr[0] = 0
+        offset, row = 0, 0
+        for chunk_id, chunk_nnz in weighted:
+            shard = np.load(os.path.join(work_dir, f"weighted-{chunk_id}.npz"))
+            data[offset:offset + chunk_nnz] = shard['data']
+            indices[offset:offset + chunk_nnz] = shard['indices']
+            chunk_rows = len(shard['row_nnz'])
+            indptr[row + 1:row + chunk_rows + 1] = offset + np.cumsum(shard['row_nnz'])
+            with np.load(os.path.join(work_dir, f"counts-{chunk_id}.npz")) as counts:
+                row_ids[row:row + chunk_rows] = counts['row_ids']
+            offset += chunk_nnz
+            row += chunk_rows
+        for array in (data, indices, indptr, row_ids):
+            array.flush()
+        del data, indices, indptr, row_ids
+        np.save(os.path.join(tmp_path, 'idf.npy'), idf.astype(TFIDF_DTYPE))
+        np.save(os.path.join(tmp_path, 'terms.npy'), global_terms)
+        write_manifest(tmp_path, name, source_hash, (n_docs, len(global_terms)), nnz, np.dtype(TFIDF_DTYPE), stop_words)
+        path = publish_snapshot(name, tmp_path, final_path, index_dir)
+        timings['concat_s'] = time.perf_counter() - start
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return path, timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build a TF-IDF index snapshot from a local job CSV export")
+    parser.add_argument('csv', help="Local copy of the job sheet export")
+    parser.add_argument('--name', default='job')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--chunk-docs', type=int, default=DEFAULT_CHUNK_DOCS)
+    parser.add_argument('--index-dir', default=INDEX_DIR)
+    parser.add_argument('--min-df', type=df_arg, help="Compact: drop terms in fewer documents (count, or fraction if fractional)")
+    parser.add_argument('--max-df', type=df_arg, help="Compact: drop terms in more documents (count, or fraction if fractional)")
+    parser.add_argument('--max-terms', type=int, help="Compact: keep only this many highest-weighted terms per document")
+    args = parser.parse_args()
+    compaction = compaction_setting(args.min_df, args.max_df, args.max_terms)
+
+    source_hash = file_content_hash(args.csv)
+    start = time.perf_counter()
+    path, timings = build_index(args.name, source_hash, job_document_chunks(args.csv, args.chunk_docs),
+                                workers=args.workers, index_dir=args.index_dir)
+    if compaction:
+        # Compacted from the full snapshot, under the path the app looks up for this setting
+        vectorizer, tfidf_matrix, row_ids, _ = load_index(args.name, source_hash, index_dir=args.index_dir)
+        vectorizer, tfidf_matrix = compact_index(vectorizer, tfidf_matrix, **compaction)
+        path = save_index(args.name, source_hash, vectorizer, tfidf_matrix, row_ids, args.index_dir, compaction)
+    print(f"Wrote {path} in {time.perf_counter() - start:.1f}s ({', '.join(f'{k}={v:.1f}' for k, v in timings.items())})")
+
+
+if __name__ == "__main__":
+    main()
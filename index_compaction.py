@@ -0,0 +1,83 @@
+import numbers
+
+import numpy as np
+import scipy.sparse as sp
+from sklearn.base import clone
+from sklearn.preprocessing import normalize
+
+# Compaction of a fitted TF-IDF index. The vectorizers are fitted without
+# min_df / max_df, so every typo, URL fragment and one-off token in the job
+# descriptions gets a column. Compaction:
+#   1. drops terms whose document frequency is outside [min_df, max_df]
+#      (ints are document counts, floats fractions of the corpus, as in
+#      TfidfVectorizer);
+#   2. keeps only the max_terms highest-weighted terms of each document;
+#   3. re-normalises the rows, so a score is still a cosine.
+# Kept terms keep their IDF, so queries are weighted as before; words that
+# were dropped are simply unknown to the compacted vectorizer.
+# A setting is a dict of these keyword arguments, e.g.
+# {'min_df': 2, 'max_df': 0.5, 'max_terms': 200}; snapshots record it.
+
+
+def document_frequency(tfidf_matrix):
+    return np.bincount(tfidf_matrix.indices, minlength=tfidf_matrix.shape[1])
+
+
+def doc_count(value, n_docs):
+    return value if isinstance(value, numbers.Integral) else value * n_docs
+
+
+def cap_row_terms(tfidf_matrix, max_terms):
+    # Keeps the max_terms largest weights of every row, in column order
+    row_nnz = np.diff(tfidf_matrix.indptr)
+    if row_nnz.max(initial=0) <= max_terms:
+        return tfidf_matrix
+    rows = np.repeat(np.arange(tfidf_matrix.shape[0]), row_nnz)
+    # Rows stay in place, so the i-th entry of order is ranked i - indptr[row]
+    order = np.lexsort((-tfidf_matrix.data, rows))
+    rank = np.arange(tfidf_matrix.nnz) - tfidf_matrix.indptr[rows]
+    keep = np.zeros(tfidf_matrix.nnz, dtype=bool)
+    keep[order[rank < max_terms]] = True
+    indptr = np.zeros_like(tfidf_matrix.indptr)
+    np.cumsum(np.minimum(row_nnz, max_terms), out=indptr[1:])
+    return sp.csr_matrix((tfidf_matrix.data[keep], tfidf_matrix.indices[keep], indptr), shape=tfidf_matrix.shape)
+
+
+def compact_index(vectorizer, tfidf_matrix, min_df=1, max_df=1.0, max_terms=None):
+    tfidf_matrix = sp.csr_matrix(tfidf_matrix)
+    n_docs = tfidf_matrix.shape[0]
+    doc_freq = document_frequency(tfidf_matrix)
+    kept = np.flatnonzero((doc_freq >= doc_count(min_df, n_docs)) & (doc_freq <= doc_count(max_df, n_docs)))
+
+    compacted = tfidf_matrix[:, kept]
+    if max_terms is not None:
+        compacted = cap_row_terms(compacted, max_terms)
+    compacted = normalize(compacted, copy=False)
+    compacted.sort_indices()
+
+    compacted_vectorizer = clone(vectorizer)
+    terms = vectorizer.get_feature_names_out()[kept]
+    compacted_vectorizer.vocabulary_ = {term: i for i, term in enumerate(terms.tolist())}
+    compacted_vectorizer.idf_ = np.asarray(vectorizer.idf_)[kept]
+    return compacted_vectorizer, compacted
+
+
+def df_arg(value):
+    # Command-line min_df / max_df: '2' is a document count, '0.5' a fraction
+    return float(value) if '.' in value or 'e' in value.lower() else int(value)
+
+
+def compaction_setting(min_df=None, max_df=None, max_terms=None):
+    # The setting dict from optional values; None when nothing is compacted
+    setting = {key: value for key, value in (('min_df', min_df), ('max_df', max_df), ('max_terms', max_terms))
+               if value is not None}
+    return setting or None
+
+
+def index_size(tfidf_matrix):
+    tfidf_matrix = sp.csr_matrix(tfidf_matrix)
+    return {
+        'terms': int(tfidf_matrix.shape[1]),
+        'nnz': int(tfidf_matrix.nnz),
+        'matrix_mb': round((tfidf_matrix.data.nbytes + tfidf_matrix.indices.nbytes + tfidf_matrix.indptr.nbytes) / 2**20, 2),
+    }
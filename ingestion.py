@@ -0,0 +1,122 @@
+import hashlib
+
+import numpy as np
+import pandas as pd
+
+# Only the columns the UI, the filters and the vectorizer read, with explicit
+# dtypes so the C parser never has to infer them. Salaries are read as text
+# and converted afterwards, so a stray non-numeric cell becomes NaN instead of
+# failing the whole read; they stay floats, as the old inferred read gave.
+JOB_SCHEMA = {
+    'title': str,
+    'description_x': str,
+    'skills_desc': str,
+    'formatted_experience_level': str,
+    'formatted_work_type': str,
+    'name': str,
+    'country': str,
+    'city': str,
+    'job_posting_url': str,
+    'min_salary': str,
+    'max_salary': str,
+}
+NUMERIC_JOB_COLUMNS = ('min_salary', 'max_salary')
+
+COURSE_SCHEMA = {
+    'Title': str,
+    'Short Intro': str,
+    'Skills': str,
+    'Category': str,
+    'Sub-Category': str,
+    'Site': str,
+    'URL': str,
+    'Rating': str,
+    'Number of viewers': str,
+    'Language': str,
+    'Subtitle Languages': str,
+}
+
+DEFAULT_CHUNK_ROWS = 5000
+
+
+def read_job_chunks(source, chunk_rows=DEFAULT_CHUNK_ROWS):
+    # Yields job rows chunk by chunk, keeping only the first row for each
+    # description_x across the whole file (same as drop_duplicates on it).
+    # source is a path or a file-like object.
+    # Only a 16-byte BLAKE2 digest per description is remembered across
+    # chunks; missing descriptions all map to None, so only the first of them
+    # is kept too.
+    seen = set()
+    reader = pd.read_csv(source, on_bad_lines='skip', engine='c', usecols=list(JOB_SCHEMA),
+                         dtype=JOB_SCHEMA, chunksize=chunk_rows)
+    for chunk in reader:
+        for column in NUMERIC_JOB_COLUMNS:
+            chunk[column] = pd.to_numeric(chunk[column], errors='coerce')
+        descriptions = chunk['description_x']
+        keys = [description_key(text) if isinstance(text, str) else None for text in descriptions.tolist()]
+        first = np.fromiter((not (key in seen or seen.add(key)) for key in keys), dtype=bool, count=len(keys))
+        chunk = chunk[first]
+        if len(chunk):
+            yield chunk
+
+
+def description_key(text):
+    return hashlib.blake2b(text.encode('utf-8', 'surrogatepass'), digest_size=16).digest()
+
+
+def job_documents(chunk):
+    return chunk['title'].fillna('') + ' ' + chunk['description_x'].fillna('') + ' ' + chunk['skills_desc'].fillna('')
+
+
+def job_document_chunks(source, chunk_rows=DEFAULT_CHUNK_ROWS):
+    # Raw combined text per chunk; the index builder normalises it in its workers
+    for chunk in read_job_chunks(source, chunk_rows):
+        yield job_documents(chunk)
+
+
+def read_job_frame(source, chunk_rows=DEFAULT_CHUNK_ROWS):
+    chunks = list(read_job_chunks(source, chunk_rows))
+    if not chunks:
+        return pd.DataFrame({column: pd.Series(dtype=np.float64 if column in NUMERIC_JOB_COLUMNS else dtype)
+                             for column, dtype in JOB_SCHEMA.items()})
+    return pd.concat(chunks)
+
+
+def read_course_frame(source):
+    return pd.read_csv(source, usecols=list(COURSE_SCHEMA), dtype=COURSE_SCHEMA)
+
+
+def clean_course_frame(csv_path):
+    df_course = read_course_frame(csv_path)
+
+    df_course = df_course.apply(lambda x: x.str.strip() if x.dtype == "object" else x)
+    df_course = df_course.drop_duplicates(subset=['Title', 'Short Intro'])
+    translations = {
+        '计算机科学': 'Computer Science',
+        'Ciencia de Datos': 'Data Science',
+        'Negocios': 'Business',
+        'Ciencias de la Computación': 'Computer Science',
+        'Negócios': 'Business',
+        'データサイエンス': 'Data Science',
+        'Tecnologia da informação': 'Information Technology'
+    }
+    df_course['Category'] = df_course['Category'].replace(translations)
+    df_course['Rating'] = df_course['Rating'].str.replace('stars', '', regex=False)
+    df_course['Number of viewers'] = df_course['Number of viewers'].str.replace(r'\D+', '', regex=True)
+    combined = df_course['Title'] + ' ' + df_course['Short Intro'].fillna('') + ' ' + df_course['Skills'].fillna('') + ' ' + df_course['Category'].fillna('') + ' ' + df_course['Sub-Category'].fillna('')
+    df_course = df_course.fillna('Unknown')
+    df_course['Number of viewers'] = pd.to_numeric(df_course['Number of viewers'], errors='coerce').fillna(0).astype(int)
+    df_course['Rating'] = pd.to_numeric(df_course['Rating'], errors='coerce').fillna(0)
+    df_course['Subtitle Languages'] = df_course['Subtitle Languages'].str.replace('Subtitles: ', '', regex=False)
+
+    keywords = ['Participant', 'Designed', 'Learners', 'prior', 'experience', 'natural', 'space', 'aeronautics']
+
+    def remove_keywords(text, keywords):
+        if pd.isna(text):
+            return np.nan
+        if any(keyword in text for keyword in keywords):
+            return np.nan
+        return text
+
+    df_course['Subtitle Languages'] = df_course['Subtitle Languages'].apply(lambda x: remove_keywords(x, keywords))
+    return df_course, combined
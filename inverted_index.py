@@ -0,0 +1,82 @@
+import numpy as np
+import scipy.sparse as sp
+
+
+class InvertedIndex:
+    # Term-at-a-time retrieval over the postings of the query terms only,
+    # with MaxScore-style pruning: terms are walked in order of their best
+    # possible contribution, and once the bound left in the unwalked terms
+    # drops below the current k-th partial score, no unseen document can
+    # enter the top k. Survivors are then scored exactly against the CSR rows,
+    # so the returned scores are the same as the full matrix product.
+    def __init__(self, tfidf_matrix):
+        self.matrix = sp.csr_matrix(tfidf_matrix)
+        self.n_docs = self.matrix.shape[0]
+        postings = self.matrix.tocsc()
+        postings.sort_indices()
+        self.postings_ptr = postings.indptr
+        self.postings_docs = postings.indices
+        self.postings_weights = postings.data
+        self.max_weights = postings.max(axis=0).toarray().ravel()
+
+    def postings(self, term, allowed=None):
+        start, end = self.postings_ptr[term], self.postings_ptr[term + 1]
+        docs = self.postings_docs[start:end]
+        weights = self.postings_weights[start:end]
+        if allowed is not None:
+            keep = allowed[docs]
+            docs, weights = docs[keep], weights[keep]
+        return docs, weights
+
+    def exact_scores(self, user_tfidf, docs):
+        if 2 * len(docs) > self.n_docs:
+            full = np.asarray((self.matrix @ user_tfidf.T).todense()).ravel()
+            return full[docs]
+        return np.asarray((self.matrix[docs] @ user_tfidf.T).todense()).ravel()
+
+    def search(self, user_tfidf, k=None, min_score=0.0, rows=None):
+        # Returns (row ids, scores) of every row that can be in the top k with
+        # a score above min_score; the caller does the final ordering.
+        empty = np.empty(0, dtype=np.int32), np.empty(0, dtype=self.matrix.dtype)
+        user_tfidf = sp.csr_matrix(user_tfidf)
+        terms, weights = user_tfidf.indices, user_tfidf.data
+        if len(terms) == 0 or (k is not None and k <= 0):
+            return empty
+
+        allowed = None
+        if rows is not None:
+            if len(rows) == 0:
+                return empty
+            allowed = np.zeros(self.n_docs, dtype=bool)
+            allowed[rows] = True
+
+        bounds = weights * self.max_weights[terms]
+        order = np.argsort(-bounds, kind='stable')
+        terms, weights, bounds = terms[order], weights[order], bounds[order]
+        # remaining[i] is the most the terms from i onwards can add to any row
+        remaining = np.append(np.cumsum(bounds[::-1])[::-1], 0.0)
+
+        if k is None:
+            docs = np.unique(np.concatenate([self.postings(term, allowed)[0] for term in terms]))
+        else:
+            acc = np.zeros(self.n_docs, dtype=np.float64)
+            seen = np.empty(0, dtype=np.int32)
+            theta = -np.inf
+            walked = 0
+            for term, weight in zip(terms, weights):
+                if remaining[walked] <= min_score or remaining[walked] < theta:
+                    break
+                term_docs, term_weights = self.postings(term, allowed)
+                acc[term_docs] += weight * term_weights
+                seen = np.union1d(seen, term_docs)
+                walked += 1
+                if len(seen) >= k:
+                    theta = np.partition(acc[seen], len(seen) - k)[len(seen) - k]
+            upper = acc[seen] + remaining[walked]
+            docs = seen[(upper >= theta) & (upper > min_score)]
+
+        if len(docs) == 0:
+            return empty
+        scores = self.exact_scores(user_tfidf, docs)
+        keep = scores > min_score
+        return docs[keep], scores[keep]
@@ -1,170 +1,168 @@
 import pandas as pd
-import numpy as np
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
-import string
 import streamlit as st
-import re
-import gdown
+from recommender import course_filters, job_filters
+from text_normalization import normalize_text_column, remove_asterisks_column
+from ingestion import clean_course_frame, job_documents, read_job_frame
+from engines import TfidfEngine
+from dataset_mirror import DatasetMirror, GdownRemote
+from frame_store import build_or_load_frame
+from facets import build_facet_index, facet_counts
+from memory_layout import COURSE_CATEGORICAL, COURSE_COLUMNS, JOB_CATEGORICAL, JOB_COLUMNS, compact_frame
+from result_cache import ResultCache, query_key
+from shared_index import IndexHolder, SearchIndex
+from embeddings import BertEncoder
+from hybrid import DEFAULT_DENSE_WEIGHT, build_reranker
+from tracing import configure, span, tracer
+from warmup import Warmup
 st.set_page_config(page_title="TriStep - Career and Learning Recommendation System", page_icon="🚀", layout="wide")
 
-def preprocess_text_simple(text):
-    if pd.isna(text):
-        return ""
-    text = text.lower()
-    text = text.translate(str.maketrans('', '', string.punctuation))
-    text = re.sub(r'\*+', '', text)
-    return text
-
-def remove_asterisks(text):
-    if pd.isna(text):
-        return text
-    return re.sub(r'\*+', '', text)
-
-def recommend_job(user_input, df, vectorizer, tfidf_matrix, experience_levels=None, work_types=None, name=None, country=None):
-    # Jangan hitung ulang tfidf_matrix di sini
-    user_input_processed = preprocess_text_simple(user_input)
-    user_tfidf = vectorizer.transform([user_input_processed])
-    
-    cosine_similarities = cosine_similarity(user_tfidf, tfidf_matrix).flatten()
-    
-    # Filter recommendations with cosine similarity > 0 and sort
-    above_zero = cosine_similarities > 0
-    if not any(above_zero):
+JOB_FACETS = ['formatted_experience_level', 'formatted_work_type', 'name', 'country']
+COURSE_FACETS = ['Site', 'Subtitle Languages']
+# Multi-valued facets, counted per list item
+COURSE_FACET_SEPARATORS = {'Subtitle Languages': ','}
+# 'matrix' scores every row with one sparse product, 'inverted' walks term postings with early termination
+RETRIEVAL_ENGINE = 'matrix'
+# Index compaction (see index_compaction.py), e.g. {'min_df': 2, 'max_df': 0.5, 'max_terms': 200};
+# None serves the full index. Check a setting with benchmark.py compaction / offline_eval.py first.
+JOB_COMPACTION = None
+COURSE_COMPACTION = None
+# Dense model for the hybrid ranking option (e.g. 'bert-base-uncased'); None
+# leaves both pages on TF-IDF only. The first start embeds the whole corpus.
+DENSE_MODEL = None
+DENSE_WEIGHT = DEFAULT_DENSE_WEIGHT
+RANKING_MODES = {'TF-IDF': None, 'Hybrid (TF-IDF + dense re-rank)': 'hybrid'}
+# Per-stage request timings: one JSON log line per search and page render,
+# plus a sidebar panel with rolling percentiles. Off by default.
+TRACE_REQUESTS = False
+# Fetch the sheets and fit both indexes on background workers, so Home paints
+# at once and Find / Grow wait only for their own index. False waits for both
+# before the first page, as the app used to.
+LAZY_INDEX_LOADING = True
+
+JOB_CSV_URL = 'https://docs.google.com/spreadsheets/d/1huKbxP4W5c5sBWAQ5LzerhdId6TR9glCRFKn7DNOKEE/export?format=csv&gid=1980208131'
+COURSE_CSV_URL = 'https://docs.google.com/spreadsheets/d/1PM_ifqhHQbvVau26xH2rU7xEw8ib1t2D6s_eDRPzJVI/export?format=csv&gid=2031125993'
+SIDEBAR_IMAGE_URL = 'https://drive.google.com/uc?id=1lhfFczKatGDEuq3ux2y-AqfPpVC96UZ9'
+HEADER_IMAGE_URL = 'https://drive.google.com/uc?id=1hbpQIE7Ez0Z4k1Sfq8FSO80_5HRujdjP'
+
+@st.cache_resource
+def load_mirror():
+    # Serves the sheets and images from local copies, refreshed in the background
+    return DatasetMirror()
+
+def build_job_index(version_job, csv_path):
+    def build_frame():
+        # Typed, column-projected chunks, deduplicated on 'description_x' while reading
+        df_job = read_job_frame(csv_path)
+        df_job['title'] = remove_asterisks_column(df_job['title'])
+        return df_job
+
+    # The cleaned frame, memory-mapped from its Arrow file; the CSV is only
+    # parsed again when the sheet content changed.
+    store = build_or_load_frame('job', version_job, build_frame)
+
+    def build_corpus():
+        # remove_asterisks only drops '*', which normalisation deletes anyway
+        return normalize_text_column(job_documents(store.to_pandas(['title', 'description_x', 'skills_desc'])))
+
+    # Text columns get "Unknown", salaries stay numeric, facets become categoricals
+    df_job = compact_frame(store.to_pandas(JOB_COLUMNS), JOB_COLUMNS, JOB_CATEGORICAL)
+    # Reuse the on-disk snapshot unless the sheet content changed
+    engine_job = TfidfEngine.load('job', version_job, df_job.index, build_corpus, inverted=RETRIEVAL_ENGINE == 'inverted',
+                                  compaction=JOB_COMPACTION)
+    facets_job = build_facet_index(df_job, JOB_FACETS)
+    return SearchIndex('job', version_job, df_job, engine_job.vectorizer, engine_job.tfidf_matrix, facets_job,
+                       engine=engine_job, store=store, reranker=build_dense_reranker('job', build_corpus))
+
+def build_course_index(version_course, csv_path):
+    store = build_or_load_frame('course', version_course, lambda: clean_course_frame(csv_path)[0])
+    # Already filled while cleaning; missing subtitle languages stay missing
+    df_course = compact_frame(store.to_pandas(COURSE_COLUMNS), COURSE_COLUMNS, COURSE_CATEGORICAL, fill_value=None)
+    def build_corpus():
+        return normalize_text_column(clean_course_frame(csv_path)[1])
+
+    engine_course = TfidfEngine.load('course', version_course, df_course.index, build_corpus,
+                                     inverted=RETRIEVAL_ENGINE == 'inverted', compaction=COURSE_COMPACTION)
+    facets_course = build_facet_index(df_course, COURSE_FACETS, COURSE_FACET_SEPARATORS)
+    return SearchIndex('course', version_course, df_course, engine_course.vectorizer, engine_course.tfidf_matrix,
+                       facets_course, engine=engine_course, store=store,
+                       reranker=build_dense_reranker('course', build_corpus))
+
+def build_dense_reranker(name, build_corpus):
+    # Document vectors over the same normalised texts the TF-IDF index uses
+    if DENSE_MODEL is None:
         return None
-
-    top_job_indices = np.where(above_zero)[0]
-    
-    top_job_indices = top_job_indices[np.argsort(cosine_similarities[top_job_indices])[::-1]]
-    
-    top_jobs = df.iloc[top_job_indices].copy()
-    top_jobs['cosine_similarity'] = cosine_similarities[top_job_indices]
-    
-    # Apply filters after cosine similarity calculation
-    if experience_levels:
-        top_jobs = top_jobs[top_jobs['formatted_experience_level'].isin(experience_levels)]
-    if work_types:
-        top_jobs = top_jobs[top_jobs['formatted_work_type'].isin(work_types)]
-    if name and name != 'All':
-        top_jobs = top_jobs[top_jobs['name'] == name]
-    if country and country != 'All':
-        top_jobs = top_jobs[top_jobs['country'] == country]
-    
-    if top_jobs.empty:
-        return None
-
-    top_jobs.reset_index(drop=True, inplace=True)
-    
-    return top_jobs
-
-
-def recommend_course(user_input, df, vectorizer, tfidf_matrix, selected_sites=None, selected_subtitle=None):
-    user_input_processed = preprocess_text_simple(user_input)
-    user_tfidf = vectorizer.transform([user_input_processed])
-    
-    cosine_similarities = cosine_similarity(user_tfidf, tfidf_matrix).flatten()
-    
-    above_zero = cosine_similarities > 0
-    if not any(above_zero):
-        return None
-
-    threshold = np.percentile(cosine_similarities[above_zero], 95)
-
-    above_threshold = cosine_similarities >= threshold
-    top_course_indices = np.where(above_threshold)[0]
-
-    if len(top_course_indices) == 0:
-        return None
-
-    top_course_indices = top_course_indices[np.argsort(cosine_similarities[top_course_indices])[::-1]]
-
-    top_courses = df.iloc[top_course_indices].copy()
-    top_courses['cosine_similarity'] = cosine_similarities[top_course_indices]
-
-    # Apply filters after cosine similarity calculation
-    if selected_sites:
-        top_courses = top_courses[top_courses['Site'].isin(selected_sites)]
-    if selected_subtitle and selected_subtitle != 'All':
-        top_courses = top_courses[top_courses['Subtitle Languages'].str.contains(selected_subtitle, na=False)]
-
-    if top_courses.empty:
-        return None
-
-    top_courses.reset_index(drop=True, inplace=True)
-    return top_courses
-@st.cache_data
-def load_job_data():
-    csv_url = 'https://docs.google.com/spreadsheets/d/1huKbxP4W5c5sBWAQ5LzerhdId6TR9glCRFKn7DNOKEE/export?format=csv&gid=1980208131'
-    df_job = pd.read_csv(csv_url, on_bad_lines='skip', engine='python')
-    
-    # Drop duplicates based on 'description_x'
-    df_job = df_job.drop_duplicates(subset=['description_x'])
-    
-    df_job['Combined'] = df_job['title'].fillna('') + ' ' + df_job['description_x'].fillna('') + ' ' + df_job['skills_desc'].fillna('')
-    df_job['Combined'] = df_job['Combined'].apply(preprocess_text_simple)
-    df_job['title'] = df_job['title'].apply(remove_asterisks)
-    vectorizer_job = TfidfVectorizer(stop_words='english')
-    tfidf_matrix_job = vectorizer_job.fit_transform(df_job['Combined'])
-    return df_job, vectorizer_job, tfidf_matrix_job
-
-@st.cache_data
-def load_course_data():
-    csv_url = 'https://docs.google.com/spreadsheets/d/1PM_ifqhHQbvVau26xH2rU7xEw8ib1t2D6s_eDRPzJVI/export?format=csv&gid=2031125993'
-    df_course = pd.read_csv(csv_url)
-    
-    df_course = df_course.apply(lambda x: x.str.strip() if x.dtype == "object" else x)
-    df_course = df_course.drop_duplicates(subset=['Title', 'Short Intro'])
-    translations = {
-        '计算机科学': 'Computer Science',
-        'Ciencia de Datos': 'Data Science',
-        'Negocios': 'Business',
-        'Ciencias de la Computación': 'Computer Science',
-        'Negócios': 'Business',
-        'データサイエンス': 'Data Science',
-        'Tecnologia da informação': 'Information Technology'
-    }
-    df_course['Category'] = df_course['Category'].replace(translations)
-    df_course['Rating'] = df_course['Rating'].str.replace('stars', '', regex=False)
-    df_course['Number of viewers'] = df_course['Number of viewers'].str.replace(r'\D+', '', regex=True)
-    df_course['combined'] = df_course['Title'] + ' ' + df_course['Short Intro'].fillna('') + ' ' + df_course['Skills'].fillna('') + ' ' + df_course['Category'].fillna('') + ' ' + df_course['Sub-Category'].fillna('')
-    df_course['combined'] = df_course['combined'].apply(preprocess_text_simple)
-    df_course = df_course.fillna('Unknown')
-    df_course['Number of viewers'] = pd.to_numeric(df_course['Number of viewers'], errors='coerce').fillna(0).astype(int)
-    df_course['Rating'] = pd.to_numeric(df_course['Rating'], errors='coerce').fillna(0)
-    df_course['Subtitle Languages'] = df_course['Subtitle Languages'].str.replace('Subtitles: ', '', regex=False)
-    
-    keywords = ['Participant', 'Designed', 'Learners', 'prior', 'experience', 'natural', 'space', 'aeronautics']
-    
-    def remove_keywords(text, keywords):
-        if pd.isna(text):
-            return np.nan
-        if any(keyword in text for keyword in keywords):
-            return np.nan
-        return text
-    
-    df_course['Subtitle Languages'] = df_course['Subtitle Languages'].apply(lambda x: remove_keywords(x, keywords))
-    
-    vectorizer_course = TfidfVectorizer(stop_words='english')
-    tfidf_matrix_course = vectorizer_course.fit_transform(df_course['combined'])
-    return df_course, vectorizer_course, tfidf_matrix_course
-    
-@st.cache_data
-def download_images():
-    url1 = 'https://drive.google.com/uc?id=1lhfFczKatGDEuq3ux2y-AqfPpVC96UZ9'
-    output1 = 'Minimalist_Black_and_White_Blank_Paper_Document_1.png'
-    gdown.download(url1, output1, quiet=False)
-
-    url2 = 'https://drive.google.com/uc?id=1hbpQIE7Ez0Z4k1Sfq8FSO80_5HRujdjP'
-    output2 = 'nobg2.png'
-    gdown.download(url2, output2, quiet=False)
-
-    return output1, output2
-
-df_job, vectorizer_job, tfidf_matrix_job = load_job_data()
-df_job.fillna("Unknown", inplace=True)
-df_course, vectorizer_course, tfidf_matrix_course = load_course_data()
-
-image1_path, image2_path = download_images()
+    return build_reranker(name, build_corpus().tolist(), load_dense_encoder(DENSE_MODEL), DENSE_WEIGHT)
+
+@st.cache_resource
+def load_dense_encoder(model_name):
+    return BertEncoder(model_name)
+
+@st.cache_resource
+def load_index_holder(name):
+    # One holder per index for the whole process; sessions share its current
+    # SearchIndex by reference instead of unpickling a copy per rerun
+    return IndexHolder(name, build_job_index if name == 'job' else build_course_index)
+
+@st.cache_resource
+def load_result_cache(name):
+    # One cache per index, shared by every session in this process
+    return ResultCache(max_entries=256, ttl_seconds=30 * 60)
+
+INDEX_SOURCES = {
+    'job': ('jobs.csv', JOB_CSV_URL),
+    'course': ('courses.csv', COURSE_CSV_URL),
+}
+IMAGE_SOURCES = {
+    'sidebar_image': ('Minimalist_Black_and_White_Blank_Paper_Document_1.png', SIDEBAR_IMAGE_URL),
+    'header_image': ('nobg2.png', HEADER_IMAGE_URL),
+}
+LOADING_STAGES = {'queued': (0.05, "Waiting to start"), 'fetching': (0.2, "Fetching the latest data"),
+                  'indexing': (0.5, "Building the search index")}
+
+def load_search_index(report, mirror, holder, file_name, url):
+    # Fetch and fit: the local sheet copy (downloaded only on the very first
+    # start), then the holder's index for that content
+    report('fetching')
+    csv_path, csv_hash = mirror.get(file_name, url)
+    report('indexing')
+    return holder.load(csv_hash, csv_path)
+
+def fetch_image(report, mirror, file_name, url):
+    report('fetching')
+    return mirror.get(file_name, url, remote=GdownRemote())[0]
+
+@st.cache_resource
+def start_warmup():
+    # Started by the first session of the process; the two fetch-and-fit
+    # pipelines and the image downloads run concurrently in the background
+    mirror = load_mirror()
+    warmup = Warmup()
+    for name, (file_name, url) in INDEX_SOURCES.items():
+        warmup.submit(name, load_search_index, mirror, load_index_holder(name), file_name, url)
+    for name, (file_name, url) in IMAGE_SOURCES.items():
+        warmup.submit(name, fetch_image, mirror, file_name, url)
+    return warmup
+
+def page_index(name):
+    # The index a page needs. Only the first load waits, on its warm-up task,
+    # with a progress bar; after that the same pipeline runs inline, which is
+    # a local read plus the holder's current index unless the sheet changed.
+    if not warmup.done(name):
+        progress = st.progress(0.0)
+        while not warmup.wait(name, timeout=0.25):
+            fraction, label = LOADING_STAGES.get(warmup.stage(name), (0.5, "Loading"))
+            progress.progress(fraction, text=f"⏳ {label}... ({warmup.elapsed(name):.0f}s)")
+        progress.empty()
+    file_name, url = INDEX_SOURCES[name]
+    return load_search_index(lambda stage: None, load_mirror(), load_index_holder(name), file_name, url)
+
+warmup = start_warmup()
+if not LAZY_INDEX_LOADING:
+    for name in INDEX_SOURCES:
+        warmup.wait(name)
+# Images appear once downloaded; a cold start paints without them
+image1_path = warmup.value('sidebar_image')
+image2_path = warmup.value('header_image')
 
 st.markdown(
     """
@@ -324,13 +322,35 @@ if 'page' not in st.session_state:
 
 st.sidebar.title("🧭 Navigation")
 st.sidebar.markdown("---")
-st.sidebar.image(image1_path, use_column_width=True)
+if image1_path is not None:
+    st.sidebar.image(image1_path, use_column_width=True)
 st.sidebar.markdown("---")
 page = st.sidebar.radio("Go to", ('🏢 Home', '📊 Step 1: Explore', '💼 Step 2: Find', '📚 Step 3: Grow'))
 st.sidebar.markdown("---")
 st.sidebar.markdown("© 2024 TriStep 🚀")
 st.sidebar.markdown("Created By M-Tree")
 
+configure(TRACE_REQUESTS)
+if TRACE_REQUESTS:
+    with st.sidebar.expander("⏱️ Request timings"):
+        timings = pd.DataFrame([{'request': request, 'stage': stage, **stats}
+                                for request, stages in tracer.summary().items() for stage, stats in stages.items()])
+        if timings.empty:
+            st.write("No traced requests yet.")
+        else:
+            st.dataframe(timings, hide_index=True)
+            traced = st.selectbox('Request', sorted(timings['request'].unique()), key='trace_request')
+            st.bar_chart(pd.Series(tracer.histogram(traced, 'total'), name='requests per ms bucket'))
+    with st.sidebar.expander("🗄️ Caches and indexes"):
+        st.write("Result caches")
+        st.dataframe(pd.DataFrame([{'cache': name, **load_result_cache(name).stats()} for name in INDEX_SOURCES])
+                     .astype({'version': str}), hide_index=True)
+        st.write("Index holders")
+        st.dataframe(pd.DataFrame([load_index_holder(name).stats() for name in INDEX_SOURCES]), hide_index=True)
+        st.write("Start-up tasks")
+        st.dataframe(pd.DataFrame([{'task': name, **status} for name, status in warmup.status().items()]),
+                     hide_index=True)
+
 if 'previous_page' not in st.session_state:
     st.session_state.previous_page = None
 
@@ -352,7 +372,8 @@ if page == '🏢 Home':
         st.write(' ')
 
     with col2:
-        st.image(image2_path)
+        if image2_path is not None:
+            st.image(image2_path)
 
     with col3:
         st.write(' ')
@@ -432,7 +453,8 @@ elif page == '📊 Step 1: Explore':
     with col1:
         st.write(' ')
     with col2:
-        st.image(image2_path)
+        if image2_path is not None:
+            st.image(image2_path)
     with col3:
         st.write(' ')
     html_string = """
@@ -484,62 +506,103 @@ elif page == '📊 Step 1: Explore':
 
 elif page == '💼 Step 2: Find':
     st.title("💼 Find the Perfect Job for You")
+    job_index = page_index('job')
+    df_job, facets_job, engine_job = job_index.df, job_index.facets, job_index.engine
+    job_store, version_job, reranker_job = job_index.store, job_index.version, job_index.reranker
+    result_cache_job = load_result_cache('job')
+    result_cache_job.bind((version_job, RETRIEVAL_ENGINE))
+    # Candidates and results are row positions into df_job, so they only hold for
+    # the index version they came from
+    if st.session_state.get('job_results_version') != version_job:
+        st.session_state.job_candidates = None
+        st.session_state.job_recommendations = None
     col1, col2, col3 = st.columns(3)
     with col1:
         st.write(' ')
     with col2:
-        st.image(image2_path)
+        if image2_path is not None:
+            st.image(image2_path)
     with col3:
         st.write(' ')
+    # Per-value counts over the rows the last search matched (every row before
+    # a search), under the selections the widgets held on the previous rerun.
+    # A filtered search scores only the filtered rows, so its counts stay within them
+    job_counts = facet_counts(facets_job, job_filters(
+        experience_levels=[level for level in facets_job['formatted_experience_level'].values if st.session_state.get(f"exp_{level}")],
+        work_types=[wt for wt in facets_job['formatted_work_type'].values if st.session_state.get(f"work_{wt}")],
+        name=st.session_state.get('job_company'),
+        country=st.session_state.get('job_country'),
+    ), rows=st.session_state.get('job_candidates'))
+
     st.subheader('🎚️ Experience Level')
-    experience_levels = [level for level in df_job['formatted_experience_level'].unique().tolist() if level != "Unknown"]
+    experience_levels = [level for level in facets_job['formatted_experience_level'].values if level != "Unknown"]
     selected_experience_levels = []
     cols = st.columns(2)
     for i, exp in enumerate(experience_levels):
         with cols[i % 2]:
-            if st.checkbox(exp, key=f"exp_{exp}"):
+            if st.checkbox(f"{exp} ({job_counts['formatted_experience_level'][exp]})", key=f"exp_{exp}"):
                 selected_experience_levels.append(exp)
                 
     st.subheader('🏢 Work Type')
-    work_types = [wt for wt in df_job['formatted_work_type'].unique().tolist() if wt != "Unknown" and wt != "Other"]
+    work_types = [wt for wt in facets_job['formatted_work_type'].values if wt != "Unknown" and wt != "Other"]
     selected_work_types = []
     cols = st.columns(2)
     for i, work in enumerate(work_types):
         with cols[i % 2]:
-            if st.checkbox(work, key=f"work_{work}"):
+            if st.checkbox(f"{work} ({job_counts['formatted_work_type'][work]})", key=f"work_{work}"):
                 selected_work_types.append(work)
 
     st.subheader('📍 Location')
-    unique_countries = ['All'] + sorted([country for country in df_job['country'].unique().tolist() if country != "Unknown"])
-    selected_country = st.selectbox('Choose a country', unique_countries)
+    unique_countries = ['All'] + [country for country in facets_job['country'].sorted_values if country != "Unknown"]
+    selected_country = st.selectbox('Choose a country', unique_countries, key='job_country',
+                                    format_func=lambda c: c if c == 'All' else f"{c} ({job_counts['country'][c]})")
 
     st.subheader('🔍 Company Name')
-    unique_companies = ['All'] + sorted([company for company in df_job['name'].unique().tolist() if company != "Unknown"])
-    name = st.selectbox('Select a company', unique_companies)
+    unique_companies = ['All'] + [company for company in facets_job['name'].sorted_values if company != "Unknown"]
+    name = st.selectbox('Select a company', unique_companies, key='job_company',
+                        format_func=lambda c: c if c == 'All' else f"{c} ({job_counts['name'][c]})")
 
     user_input = st.text_area(
     "🧑‍💼 Prompt your career profile (e.g., education background, key skills, project experience, certifications, and interests)", 
     height=150,
     help="For better recommendations, provide detailed information such as:\n\n 'I am a Programmer with experience in designing, developing, testing, and maintaining complex applications. I have a strong understanding of industry best practices, and I'm proficient in writing clean, efficient code. I have experience collaborating with cross-functional teams, working with external APIs, and ensuring optimal application performance and quality. I am also skilled in identifying and resolving bottlenecks and bugs to maintain high code quality.'")
     
+    ranking_job = None
+    if reranker_job is not None:
+        ranking_job = RANKING_MODES[st.radio('⚖️ Ranking', list(RANKING_MODES), key='job_ranking', horizontal=True)]
+
     if st.button("🚀 Get Job Insights", key="get_job_recommendations"):
-        recommendations = recommend_job(
-            user_input,
-            df_job,
-            vectorizer_job,
-            tfidf_matrix_job,
-            selected_experience_levels if selected_experience_levels else None,
-            selected_work_types if selected_work_types else None,
-            name if name != 'All' else None,
-            selected_country if selected_country != 'All' else None
-        )
-        if recommendations is None or recommendations.empty:
-            st.error("😕 No relevant jobs found matching your criteria. Please try adjusting your filters or providing more details in your career profile.")
-            st.session_state.job_recommendations = None
-            st.session_state.job_page = 0
-        else:
-            st.session_state.job_recommendations = recommendations
-            st.session_state.job_page = 0
+        with tracer.request('job_search', ranking=ranking_job):
+            job_selection = dict(
+                experience_levels=selected_experience_levels if selected_experience_levels else None,
+                work_types=selected_work_types if selected_work_types else None,
+                name=name if name != 'All' else None,
+                country=selected_country if selected_country != 'All' else None
+            )
+            recommendations, candidates = result_cache_job.get_or_compute(
+                # The dense reranker sees the raw text, which the normalised key
+                # does not capture, so hybrid results are also keyed on it
+                query_key(user_input, **job_selection, ranking=ranking_job,
+                          raw_text=user_input if ranking_job == 'hybrid' else None),
+                lambda: engine_job.recommend_job(
+                    user_input,
+                    df_job,
+                    **job_selection,
+                    facets=facets_job,
+                    reranker=reranker_job if ranking_job == 'hybrid' else None,
+                    lazy=True,
+                    with_candidates=True
+                )
+            )
+            st.session_state.job_candidates = candidates
+            st.session_state.job_results_version = version_job
+            if recommendations is None or len(recommendations) == 0:
+                st.error("😕 No relevant jobs found matching your criteria. Please try adjusting your filters or providing more details in your career profile.")
+                st.session_state.job_recommendations = None
+                st.session_state.job_page = 0
+            else:
+                st.session_state.job_recommendations = recommendations
+                st.session_state.job_page = 0
 
     if 'job_recommendations' in st.session_state and st.session_state.job_recommendations is not None:
         recommendations = st.session_state.job_recommendations
@@ -550,29 +613,34 @@ elif page == '💼 Step 2: Find':
     
         st.write("### 🎯 Here Are The Most Suitable Jobs For You:")
         # Adjust the job description display to be justified
-        for i, (_, row) in enumerate(recommendations.iloc[start_index:end_index].iterrows(), start=start_index + 1):
-            st.markdown(f"#### {i}. {row['title']}")
-            st.markdown(f"🏢 Company Name: {row['name']}")
-            st.markdown(f"📍 Country: {row['country']}")
-            st.markdown(f"📍 City: {row['city']}")
-            st.markdown(f"[🔗 View Job Posting]({row['job_posting_url']})")
-            with st.expander("📄 More Info"):
-                # Applying justify alignment to the description
-                st.markdown(
-                    f"<p style='text-align: justify;'>{row['description_x']}</p>", 
-                    unsafe_allow_html=True
-                )
-                if row['min_salary'] == 'Unknown':
-                    st.markdown(f"💰 Min Salary (Yearly): {row['min_salary']}")
-                else:
-                    st.markdown(f"💰 Min Salary (Yearly): Rp{row['min_salary']}")
-                if row['max_salary'] == 'Unknown':
-                    st.markdown(f"💵 Max Salary (Yearly): {row['max_salary']}")
-                else:
-                    st.markdown(f"💵 Max Salary (Yearly): Rp{row['max_salary']}")
-                st.markdown(f"🕒 Work Type: {row['formatted_work_type']}")
-                st.markdown(f"🎓 Experience Level: {row['formatted_experience_level']}")
-            st.markdown("---")
+        with tracer.request('job_render', page=page):
+            with span('page_slice'):
+                page_rows = recommendations.rows(df_job, start_index, end_index)
+            with span('render'):
+                for i, (_, row) in enumerate(page_rows.iterrows(), start=start_index + 1):
+                    st.markdown(f"#### {i}. {row['title']}")
+                    st.markdown(f"🏢 Company Name: {row['name']}")
+                    st.markdown(f"📍 Country: {row['country']}")
+                    st.markdown(f"📍 City: {row['city']}")
+                    st.markdown(f"[🔗 View Job Posting]({row['job_posting_url']})")
+                    with st.expander("📄 More Info"):
+                        # Applying justify alignment to the description
+                        description = job_store.value('description_x', row.name)
+                        st.markdown(
+                            f"<p style='text-align: justify;'>{'Unknown' if description is None else description}</p>", 
+                            unsafe_allow_html=True
+                        )
+                        if pd.isna(row['min_salary']):
+                            st.markdown("💰 Min Salary (Yearly): Unknown")
+                        else:
+                            st.markdown(f"💰 Min Salary (Yearly): Rp{row['min_salary']}")
+                        if pd.isna(row['max_salary']):
+                            st.markdown("💵 Max Salary (Yearly): Unknown")
+                        else:
+                            st.markdown(f"💵 Max Salary (Yearly): Rp{row['max_salary']}")
+                        st.markdown(f"🕒 Work Type: {row['formatted_work_type']}")
+                        st.markdown(f"🎓 Experience Level: {row['formatted_experience_level']}")
+                    st.markdown("---")
 
     
         col1, col2, col3 = st.columns([1, 6, 1])
@@ -609,26 +677,42 @@ elif page == '💼 Step 2: Find':
                 
 elif page == '📚 Step 3: Grow':
     st.title('📚 Grow Through Course Choices')
+    course_index = page_index('course')
+    df_course, facets_course, engine_course = course_index.df, course_index.facets, course_index.engine
+    version_course, reranker_course = course_index.version, course_index.reranker
+    result_cache_course = load_result_cache('course')
+    result_cache_course.bind((version_course, RETRIEVAL_ENGINE))
+    # Candidates and results are row positions into df_course, so they only hold for
+    # the index version they came from
+    if st.session_state.get('course_results_version') != version_course:
+        st.session_state.course_candidates = None
+        st.session_state.course_recommendations = None
     col1, col2, col3 = st.columns(3)
     with col1:
         st.write(' ')
     with col2:
-        st.image(image2_path)
+        if image2_path is not None:
+            st.image(image2_path)
     with col3:
         st.write(' ')
 
     st.subheader('🌐 Sites')
-    sites = [site for site in df_course['Site'].unique().tolist() if site != "Unknown"]
+    course_counts = facet_counts(facets_course, course_filters(
+        selected_sites=[site for site in facets_course['Site'].values if st.session_state.get(f"site_{site}")],
+        selected_subtitle=st.session_state.get('course_subtitle'),
+    ), rows=st.session_state.get('course_candidates'))
+    sites = [site for site in facets_course['Site'].values if site != "Unknown"]
     selected_sites = []
     cols = st.columns(2)
     for i, site in enumerate(sites):
         with cols[i % 2]:
-            if st.checkbox(site, key=f"site_{site}"):
+            if st.checkbox(f"{site} ({course_counts['Site'][site]})", key=f"site_{site}"):
                 selected_sites.append(site)
 
     st.subheader('🗣️ Subtitle Language')
-    unique_subtitles = ['All'] + sorted(set([lang.strip() for sublist in df_course['Subtitle Languages'].dropna().str.split(',') for lang in sublist if lang.strip() != 'Unknown']))
-    selected_subtitle = st.selectbox('Choose a language', unique_subtitles)
+    unique_subtitles = ['All'] + [lang for lang in facets_course['Subtitle Languages'].tokens if lang != 'Unknown']
+    selected_subtitle = st.selectbox('Choose a language', unique_subtitles, key='course_subtitle',
+                                     format_func=lambda c: c if c == 'All' else f"{c} ({course_counts['Subtitle Languages'][c]})")
 
     user_input = st.text_area(
         "🔍 Prompt skills or topics you'd like to learn:", 
@@ -636,22 +720,40 @@ elif page == '📚 Step 3: Grow':
         help="For better recommendations, provide topic or job desk from the company, such as:\n\n 'The job responsibilities I want to gain experience in include Data Engineering, Big Data Technologies, Data Transformation, and Data Modelling.'"
     )
 
+    ranking_course = None
+    if reranker_course is not None:
+        ranking_course = RANKING_MODES[st.radio('⚖️ Ranking', list(RANKING_MODES), key='course_ranking', horizontal=True)]
+
     if st.button("🚀 Get Course Recommendations", key="get_course_recommendations"):
-        recommendations = recommend_course(
-            user_input, 
-            df_course, 
-            vectorizer_course, 
-            tfidf_matrix_course,
-            selected_sites if selected_sites else None,
-            selected_subtitle if selected_subtitle != 'All' else None
-        )
-        if recommendations is None or recommendations.empty:
-            st.error("😕 No relevant courses found matching your criteria. Please try adjusting your filters or providing more details in your learning interests.")
-            st.session_state.course_recommendations = None
-            st.session_state.course_page = 0
-        else:
-            st.session_state.course_recommendations = recommendations
-            st.session_state.course_page = 0
+        with tracer.request('course_search', ranking=ranking_course):
+            course_selection = dict(
+                selected_sites=selected_sites if selected_sites else None,
+                selected_subtitle=selected_subtitle if selected_subtitle != 'All' else None
+            )
+            recommendations, candidates = result_cache_course.get_or_compute(
+                # The dense reranker sees the raw text, which the normalised key
+                # does not capture, so hybrid results are also keyed on it
+                query_key(user_input, **course_selection, ranking=ranking_course,
+                          raw_text=user_input if ranking_course == 'hybrid' else None),
+                lambda: engine_course.recommend_course(
+                    user_input,
+                    df_course,
+                    **course_selection,
+                    facets=facets_course,
+                    reranker=reranker_course if ranking_course == 'hybrid' else None,
+                    lazy=True,
+                    with_candidates=True
+                )
+            )
+            st.session_state.course_candidates = candidates
+            st.session_state.course_results_version = version_course
+            if recommendations is None or len(recommendations) == 0:
+                st.error("😕 No relevant courses found matching your criteria. Please try adjusting your filters or providing more details in your learning interests.")
+                st.session_state.course_recommendations = None
+                st.session_state.course_page = 0
+            else:
+                st.session_state.course_recommendations = recommendations
+                st.session_state.course_page = 0
 
     if 'course_recommendations' in st.session_state and st.session_state.course_recommendations is not None:
         recommendations = st.session_state.course_recommendations
@@ -661,19 +763,23 @@ elif page == '📚 Step 3: Grow':
         end_index = start_index + items_per_page
 
         st.write("### 🎯 Here Are The Most Suitable Courses For You:")
-        for i, (_, row) in enumerate(recommendations.iloc[start_index:end_index].iterrows(), start=start_index + 1):
-            st.markdown(f"#### {i}. {row['Title']}")
-            st.markdown(f"📊 Category: {row['Category']}")
-            st.markdown(f"📑 Sub-Category: {row['Sub-Category']}")
-            st.markdown(f"🌐 Site: {row['Site']}")
-            st.markdown(f"[🔗 View Course]({row['URL']})")
-            with st.expander("📄 More Info"):
-                st.markdown(f"📝 Short Intro: {row['Short Intro']}")
-                st.markdown(f"⭐ Rating: {row['Rating']}")
-                st.markdown(f"👥 Number of Viewers: {int(row['Number of viewers'])}")
-                st.markdown(f"🗣️ Language: {row['Language']}")
-                st.markdown(f"🔠 Subtitle Languages: {row['Subtitle Languages']}")
-            st.markdown("---")
+        with tracer.request('course_render', page=page):
+            with span('page_slice'):
+                page_rows = recommendations.rows(df_course, start_index, end_index)
+            with span('render'):
+                for i, (_, row) in enumerate(page_rows.iterrows(), start=start_index + 1):
+                    st.markdown(f"#### {i}. {row['Title']}")
+                    st.markdown(f"📊 Category: {row['Category']}")
+                    st.markdown(f"📑 Sub-Category: {row['Sub-Category']}")
+                    st.markdown(f"🌐 Site: {row['Site']}")
+                    st.markdown(f"[🔗 View Course]({row['URL']})")
+                    with st.expander("📄 More Info"):
+                        st.markdown(f"📝 Short Intro: {row['Short Intro']}")
+                        st.markdown(f"⭐ Rating: {row['Rating']}")
+                        st.markdown(f"👥 Number of Viewers: {int(row['Number of viewers'])}")
+                        st.markdown(f"🗣️ Language: {row['Language']}")
+                        st.markdown(f"🔠 Subtitle Languages: {row['Subtitle Languages']}")
+                    st.markdown("---")
 
         col1, col2, col3 = st.columns([1, 6, 1])
         with col1:
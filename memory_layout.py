@@ -0,0 +1,49 @@
+import pandas as pd
+import scipy.sparse as sp
+
+# Compact in-memory form of the serving frames (the TF-IDF matrices are
+# float32/int32 from tfidf_index.TFIDF_DTYPE on). Low-cardinality
+# text columns become categoricals, so each distinct value is stored once
+# plus a small integer code per row. Columns nothing reads at serve time are
+# dropped, and only text columns get the "Unknown" placeholder, so numeric
+# columns keep their dtype instead of turning into objects.
+
+# Columns the pages read from the in-memory frames. The job description stays
+# in the mapped Arrow file and is read per rendered row.
+JOB_COLUMNS = ['title', 'name', 'country', 'city', 'job_posting_url', 'min_salary', 'max_salary',
+               'formatted_work_type', 'formatted_experience_level']
+JOB_CATEGORICAL = ['formatted_experience_level', 'formatted_work_type', 'name', 'country', 'city']
+COURSE_COLUMNS = ['Title', 'Short Intro', 'Category', 'Sub-Category', 'Site', 'URL', 'Rating', 'Number of viewers',
+                  'Language', 'Subtitle Languages']
+COURSE_CATEGORICAL = ['Category', 'Sub-Category', 'Site', 'Language', 'Subtitle Languages']
+
+
+def compact_frame(df, keep_columns, categorical_columns=(), fill_value="Unknown"):
+    df = df[list(keep_columns)].copy()
+    for column in df.columns if fill_value is not None else ():
+        if not pd.api.types.is_numeric_dtype(df[column]):
+            df[column] = df[column].fillna(fill_value)
+    for column in categorical_columns:
+        df[column] = df[column].astype('category')
+    return df
+
+
+def frame_bytes(df):
+    return int(df.memory_usage(deep=True, index=True).sum())
+
+
+def matrix_bytes(matrix):
+    return int(matrix.data.nbytes + matrix.indices.nbytes + matrix.indptr.nbytes)
+
+
+def memory_report(before, after):
+    # before/after map a name to a frame or a sparse matrix
+    report = {}
+    for name in before:
+        sizes = [matrix_bytes(obj) if sp.issparse(obj) else frame_bytes(obj) for obj in (before[name], after[name])]
+        report[name] = {
+            'before_mb': round(sizes[0] / 2**20, 2),
+            'after_mb': round(sizes[1] / 2**20, 2),
+            'saved_pct': round(100 * (1 - sizes[1] / sizes[0]), 1) if sizes[0] else 0.0,
+        }
+    return report
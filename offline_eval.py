@@ -0,0 +1,185 @@
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from engines import ENGINES, TfidfEngine
+from index_compaction import compaction_setting, df_arg
+from ingestion import clean_course_frame, job_documents, read_job_frame
+from text_normalization import normalize_text_column, remove_asterisks_column
+from tfidf_index import INDEX_DIR, file_content_hash
+
+# Offline Prec@K / recall@K / nDCG@K for every engine on the hand-judged test
+# cases in evaluation/evaluation.xlsx. Relevance is pooled: a title counts as
+# relevant for a profile if the majority vote marked it relevant on any
+# method's sheet, and recall is taken against every relevant title judged for
+# that profile. Titles no sheet judged count as not relevant, so a ranking
+# that surfaces new titles is never flattered; judged_fraction shows how much
+# of a ranking the labels cover.
+DEFAULT_K = 5
+# Evaluation snapshots live apart from the served ones: building one for another
+# CSV or setting prunes stale snapshots in its directory, which must never be
+# the app's
+EVAL_INDEX_DIR = os.path.join(INDEX_DIR, 'eval')
+STEPS = {
+    # step name -> (sheet prefix, title column)
+    'job': ('Step 2', 'title'),
+    'course': ('Step 3', 'Title'),
+}
+
+
+def load_judgements(path, sheet_prefix):
+    # {profile: {recommended title: relevant}} merged over every method's sheet
+    judgements = {}
+    for sheet_name, sheet in pd.read_excel(path, sheet_name=None).items():
+        if not sheet_name.startswith(sheet_prefix):
+            continue
+        profiles = sheet.iloc[:, 1].ffill()
+        for profile, title, relevant in zip(profiles, sheet.iloc[:, 2], sheet['Boolean']):
+            if isinstance(profile, str) and isinstance(title, str):
+                judged = judgements.setdefault(profile.strip().strip('"'), {})
+                judged[title.strip()] = judged.get(title.strip(), False) or bool(relevant)
+    return judgements
+
+
+def ranking_metrics(ranked, judgements, k=DEFAULT_K):
+    # ranked maps each judged profile to its ranked titles
+    profiles = list(judgements)
+    relevant = np.zeros((len(profiles), k), dtype=bool)
+    judged = np.zeros((len(profiles), k), dtype=bool)
+    for i, profile in enumerate(profiles):
+        labels = judgements[profile]
+        for j, title in enumerate(ranked.get(profile, [])[:k]):
+            title = title.strip()
+            judged[i, j] = title in labels
+            relevant[i, j] = labels.get(title, False)
+    n_relevant = np.array([sum(labels.values()) for labels in judgements.values()])
+
+    discounts = 1 / np.log2(np.arange(2, k + 2))
+    dcg = relevant @ discounts
+    idcg = np.cumsum(discounts)[np.clip(np.minimum(n_relevant, k) - 1, 0, None)]
+    ndcg = np.where(n_relevant > 0, dcg / idcg, 0.0)
+    hits = relevant.sum(axis=1)
+    return {
+        f"prec_at_{k}": round(float((hits / k).mean()), 4),
+        f"recall_at_{k}": round(float(np.mean(hits / np.maximum(n_relevant, 1))), 4),
+        f"ndcg_at_{k}": round(float(ndcg.mean()), 4),
+        'judged_fraction': round(float(judged.mean()), 4),
+    }
+
+
+# Frames keep the index main.py builds them with, so the TF-IDF snapshot's
+# row ids match and the app's snapshot is reused rather than rebuilt
+def load_job_corpus(csv_path):
+    df = read_job_frame(csv_path)
+    df['title'] = remove_asterisks_column(df['title'])
+    return df, job_documents(df)
+
+
+def load_course_corpus(csv_path):
+    return clean_course_frame(csv_path)
+
+
+def build_engine(engine_name, step, csv_path, df, documents, compaction=None, index_dir=EVAL_INDEX_DIR):
+    if engine_name == 'tfidf':
+        # A snapshot in the same format the app loads, so the index is evaluated as it is served
+        return TfidfEngine.load(step, file_content_hash(csv_path), df.index, lambda: normalize_text_column(documents),
+                                compaction=compaction, index_dir=index_dir)
+    return ENGINES[engine_name]().fit(normalize_text_column(documents))
+
+
+def evaluate_engine(engine_name, step, csv_path, df, documents, judgements, k, compaction=None, index_dir=EVAL_INDEX_DIR):
+    start = time.perf_counter()
+    try:
+        engine = build_engine(engine_name, step, csv_path, df, documents, compaction, index_dir)
+    except ImportError as exc:
+        return {'skipped': str(exc)}
+    load_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    profiles = list(judgements)
+    titles = df[STEPS[step][1]].to_numpy()
+    ranked = {profile: titles[ids].tolist() for profile, (ids, _) in zip(profiles, engine.batch_query(profiles, k))}
+    return {
+        **ranking_metrics(ranked, judgements, k),
+        'profiles': len(profiles),
+        'load_s': round(load_s, 3),
+        'query_s': round(time.perf_counter() - start, 3),
+    }
+
+
+def evaluate(labels_path, sources, engine_names, k=DEFAULT_K, workers=None, compaction=None, index_dir=EVAL_INDEX_DIR):
+    # sources maps 'job' / 'course' to a local CSV export. The labels and each
+    # corpus are read once; every (step, engine) pair then runs on a thread.
+    # compaction applies to the TF-IDF engine only.
+    corpora = {'job': load_job_corpus, 'course': load_course_corpus}
+    jobs = []
+    for step, csv_path in sources.items():
+        judgements = load_judgements(labels_path, STEPS[step][0])
+        df, documents = corpora[step](csv_path)
+        jobs.extend((engine_name, step, csv_path, df, documents, judgements, k, compaction, index_dir)
+                    for engine_name in engine_names)
+    with ThreadPoolExecutor(max_workers=workers or len(jobs) or 1) as pool:
+        reports = list(pool.map(lambda job: evaluate_engine(*job), jobs))
+    results = {}
+    for job, report in zip(jobs, reports):
+        results.setdefault(job[1], {})[job[0]] = report
+    return results
+
+
+def failed_gates(results, min_prec, k=DEFAULT_K, allow_skipped=()):
+    # An engine that could not be evaluated fails the gate too, unless it is
+    # deselected with --engines or listed in allow_skipped
+    failed = []
+    for step, engines in results.items():
+        for engine_name, report in engines.items():
+            if 'skipped' in report:
+                if engine_name not in allow_skipped:
+                    failed.append(f"{step}/{engine_name} (skipped: {report['skipped']})")
+            elif report[f"prec_at_{k}"] < min_prec:
+                failed.append(f"{step}/{engine_name}")
+    return failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline Prec@K, recall@K and nDCG@K on the judged test cases")
+    parser.add_argument('--labels', default='evaluation/evaluation.xlsx')
+    parser.add_argument('--jobs', help="Local copy of the job sheet export")
+    parser.add_argument('--courses', help="Local copy of the course sheet export")
+    parser.add_argument('--engines', nargs='+', choices=sorted(ENGINES), default=sorted(ENGINES))
+    parser.add_argument('--k', type=int, default=DEFAULT_K)
+    parser.add_argument('--min-prec', type=float, default=None,
+                        help="Exit with status 1 if any selected engine's Prec@K is below this or it could not be evaluated")
+    parser.add_argument('--allow-skipped', nargs='+', choices=sorted(ENGINES), default=[],
+                        help="Engines that may be skipped (e.g. a missing optional dependency) without failing --min-prec")
+    parser.add_argument('--min-df', type=df_arg, help="Evaluate the TF-IDF index compacted with this min_df")
+    parser.add_argument('--max-df', type=df_arg, help="Evaluate the TF-IDF index compacted with this max_df")
+    parser.add_argument('--max-terms', type=int, help="Evaluate the TF-IDF index capped to this many terms per document")
+    parser.add_argument('--index-dir', default=EVAL_INDEX_DIR,
+                        help="Where TF-IDF snapshots are built and cached; keep it apart from the app's index_cache")
+    args = parser.parse_args()
+
+    sources = {step: path for step, path in (('job', args.jobs), ('course', args.courses)) if path}
+    if not sources:
+        parser.error("pass --jobs and/or --courses")
+    start = time.perf_counter()
+    compaction = compaction_setting(args.min_df, args.max_df, args.max_terms)
+    results = evaluate(args.labels, sources, args.engines, args.k, compaction=compaction, index_dir=args.index_dir)
+    results['compaction'] = compaction
+    results['wall_s'] = round(time.perf_counter() - start, 3)
+    print(json.dumps(results, indent=2))
+    if args.min_prec is not None:
+        failed = failed_gates({step: results[step] for step in sources}, args.min_prec, args.k,
+                              allow_skipped=args.allow_skipped)
+        if failed:
+            print(f"Prec@{args.k} below {args.min_prec} or not evaluated: {', '.join(failed)}", file=sys.stderr)
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,290 @@
+import re
+import string
+from functools import partial
+
+import numpy as np
+import pandas as pd
+
+from facets import filter_rows
+from tracing import span
+
+# Upper bound on how many ranked rows a search keeps (5 per page in the UI)
+DEFAULT_TOP_K = 100
+# Courses are drawn from the matches at or above this score percentile
+COURSE_PERCENTILE = 95
+PUNCTUATION_TABLE = str.maketrans('', '', string.punctuation)
+
+
+def preprocess_text_simple(text):
+    if pd.isna(text):
+        return ""
+    text = text.lower()
+    text = text.translate(PUNCTUATION_TABLE)
+    text = re.sub(r'\*+', '', text)
+    return text
+
+
+def remove_asterisks(text):
+    if pd.isna(text):
+        return text
+    return re.sub(r'\*+', '', text)
+
+
+def cosine_scores(user_tfidf, tfidf_matrix):
+    # TfidfVectorizer rows are already L2-normalised, so the cosine is a plain
+    # sparse dot product; cosine_similarity would re-normalise a full copy of
+    # the matrix on every query.
+    return np.asarray((tfidf_matrix @ user_tfidf.T).todense()).ravel()
+
+
+def top_k_indices(candidates, cand_scores, k=None):
+    # Highest score first; ties keep the order of the old reversed argsort
+    # (later rows first). Only the k best candidates are ever fully sorted.
+    if k is not None and k <= 0:
+        return candidates[:0], cand_scores[:0]
+    if k is not None and len(candidates) > k:
+        pivot = len(cand_scores) - k
+        kth_score = np.partition(cand_scores, pivot)[pivot]
+        keep = cand_scores >= kth_score
+        candidates = candidates[keep]
+        cand_scores = cand_scores[keep]
+    order = np.lexsort((-candidates, -cand_scores))[:k]
+    return candidates[order], cand_scores[order]
+
+
+def materialize(df, indices, scores):
+    # Only the selected rows are copied out of the shared frame. They keep the
+    # frame's index labels, which key lookups into the frame store.
+    rows = df.iloc[indices].copy()
+    rows['cosine_similarity'] = scores
+    return rows
+
+
+class ResultSet:
+    # A ranked result kept as int32 row positions and float32 scores, a few
+    # hundred bytes whatever the rows hold; rows are copied out of the
+    # shared frame only for the page being shown.
+    __slots__ = ('row_ids', 'scores')
+
+    def __init__(self, row_ids, scores):
+        self.row_ids = np.asarray(row_ids, dtype=np.int32)
+        self.scores = np.asarray(scores, dtype=np.float32)
+
+    def __len__(self):
+        return len(self.row_ids)
+
+    def rows(self, df, start=0, stop=None):
+        # Ranked rows start:stop with a cosine_similarity column; the frame's
+        # index labels are kept, so they can key lookups into the frame store
+        return df.iloc[self.row_ids[start:stop]].assign(cosine_similarity=self.scores[start:stop])
+
+
+def ranked_rows(df, indices, scores, lazy):
+    return ResultSet(indices, scores) if lazy else materialize(df, indices, scores)
+
+
+def score_rows(user_tfidf, tfidf_matrix, rows=None):
+    # Score only the candidate rows when the filters leave a small enough subset;
+    # slicing most of the matrix costs more than one full product.
+    if rows is None:
+        return cosine_scores(user_tfidf, tfidf_matrix)
+    if 2 * len(rows) > tfidf_matrix.shape[0]:
+        return cosine_scores(user_tfidf, tfidf_matrix)[rows]
+    return cosine_scores(user_tfidf, tfidf_matrix[rows])
+
+
+def job_filters(experience_levels=None, work_types=None, name=None, country=None):
+    selections = []
+    if experience_levels:
+        selections.append(('formatted_experience_level', lambda values: values.isin(experience_levels)))
+    if work_types:
+        selections.append(('formatted_work_type', lambda values: values.isin(work_types)))
+    if name and name != 'All':
+        selections.append(('name', lambda values: values == name))
+    if country and country != 'All':
+        selections.append(('country', lambda values: values == country))
+    return selections
+
+
+def course_filters(selected_sites=None, selected_subtitle=None):
+    selections = []
+    if selected_sites:
+        selections.append(('Site', lambda values: values.isin(selected_sites)))
+    if selected_subtitle and selected_subtitle != 'All':
+        selections.append(('Subtitle Languages', lambda values: values.str.contains(selected_subtitle, regex=False, na=False)))
+    return selections
+
+
+def select_jobs(df, candidates, scores, top_k, min_score, rerank=None, lazy=False):
+    # Keep rows with cosine similarity > 0 (and above the optional floor)
+    with span('select'):
+        keep = scores > min_score
+        if not keep.any():
+            return None
+        top_job_indices, top_scores = top_k_indices(candidates[keep], scores[keep], top_k)
+    if rerank is not None:
+        with span('rerank'):
+            top_job_indices, top_scores = rerank(top_job_indices, top_scores)
+    with span('materialize'):
+        return ranked_rows(df, top_job_indices, top_scores, lazy)
+
+
+def select_courses(df, matched, matched_scores, filtered, top_k, min_score, rerank=None, lazy=False):
+    # matched holds every course with a positive score: the 95th percentile
+    # cut-off is taken over all of them, before any filter applies. The
+    # min_score floor is strict, as in select_jobs.
+    if len(matched) == 0:
+        return None
+    with span('select'):
+        threshold = np.percentile(matched_scores, COURSE_PERCENTILE)
+        selected = (matched_scores >= threshold) & (matched_scores > min_score)
+        candidates, scores = matched[selected], matched_scores[selected]
+
+        if filtered is not None:
+            in_filter = np.isin(candidates, filtered, assume_unique=True)
+            candidates, scores = candidates[in_filter], scores[in_filter]
+        if len(candidates) == 0:
+            return None
+
+        top_course_indices, top_scores = top_k_indices(candidates, scores, top_k)
+    if rerank is not None:
+        with span('rerank'):
+            top_course_indices, top_scores = rerank(top_course_indices, top_scores)
+    with span('materialize'):
+        return ranked_rows(df, top_course_indices, top_scores, lazy)
+
+
+def recommend_job(user_input, df, vectorizer, tfidf_matrix, experience_levels=None, work_types=None, name=None, country=None,
+                  top_k=DEFAULT_TOP_K, min_score=0.0, facets=None, engine=None, reranker=None, lazy=False,
+                  with_candidates=False):
+    # Jangan hitung ulang tfidf_matrix di sini
+    # lazy=True returns a ResultSet instead of a copied DataFrame
+    # with_candidates=True returns (result, candidates): the rows facet counts
+    # are taken over, read off this search's own scores
+    # Filters are resolved to candidate rows first, so only those rows are
+    # scored; the candidates are then the matches among the filtered rows
+    with span('filters'):
+        candidates = filter_rows(df, facets, job_filters(experience_levels, work_types, name, country))
+    if candidates is not None and len(candidates) == 0:
+        return (None, candidates) if with_candidates else None
+
+    with span('preprocess'):
+        user_input_processed = preprocess_text_simple(user_input)
+    with span('vectorize'):
+        user_tfidf = vectorizer.transform([user_input_processed])
+
+    # reranker (hybrid.DenseReranker) re-orders only the top_k TF-IDF rows
+    rerank = None if reranker is None else partial(reranker.rerank, user_input)
+
+    # engine is an optional InvertedIndex; without it the whole (or filtered)
+    # matrix is scored with one sparse product
+    if engine is not None:
+        # Facet counts need every match, so the walk is not pruned to top_k then
+        k, floor = (None, 0.0) if with_candidates else (top_k, min_score)
+        with span('score'):
+            candidates, cosine_similarities = engine.search(user_tfidf, k, floor, rows=candidates)
+    else:
+        with span('score'):
+            cosine_similarities = score_rows(user_tfidf, tfidf_matrix, candidates)
+        if candidates is None:
+            candidates = np.arange(len(cosine_similarities))
+    result = select_jobs(df, candidates, cosine_similarities, top_k, min_score, rerank, lazy)
+    if not with_candidates:
+        return result
+    return result, matched_candidates(candidates[cosine_similarities > 0])
+
+
+def match_rows(user_tfidf, tfidf_matrix, engine=None):
+    # Every row with a positive score and its score
+    if engine is not None:
+        return engine.search(user_tfidf)
+    cosine_similarities = cosine_scores(user_tfidf, tfidf_matrix)
+    matched = np.flatnonzero(cosine_similarities > 0)
+    return matched, cosine_similarities[matched]
+
+
+def matched_candidates(matched, matched_scores=None, percentile=None):
+    # Sorted rows facet counts are taken over: every match for jobs, the
+    # matches at or above the percentile cut-off for courses
+    if percentile is not None and len(matched):
+        matched = matched[matched_scores >= np.percentile(matched_scores, percentile)]
+    return np.sort(matched).astype(np.int32)
+
+
+def query_candidates(user_input, vectorizer, tfidf_matrix, percentile=None, engine=None):
+    # Rows a query can return before any filter is applied, which is what facet
+    # counts are taken over: every match for jobs, the matches at or above the
+    # 95th percentile cut-off for courses (percentile=COURSE_PERCENTILE).
+    user_tfidf = vectorizer.transform([preprocess_text_simple(user_input)])
+    matched, matched_scores = match_rows(user_tfidf, tfidf_matrix, engine)
+    return matched_candidates(matched, matched_scores, percentile)
+
+
+def recommend_course(user_input, df, vectorizer, tfidf_matrix, selected_sites=None, selected_subtitle=None,
+                     top_k=DEFAULT_TOP_K, min_score=0.0, facets=None, engine=None, reranker=None, lazy=False,
+                     with_candidates=False):
+    with span('preprocess'):
+        user_input_processed = preprocess_text_simple(user_input)
+    with span('vectorize'):
+        user_tfidf = vectorizer.transform([user_input_processed])
+    with span('score'):
+        matched, matched_scores = match_rows(user_tfidf, tfidf_matrix, engine)
+
+    with span('filters'):
+        filtered = filter_rows(df, facets, course_filters(selected_sites, selected_subtitle))
+    rerank = None if reranker is None else partial(reranker.rerank, user_input)
+    result = select_courses(df, matched, matched_scores, filtered, top_k, min_score, rerank, lazy)
+    if not with_candidates:
+        return result
+    return result, matched_candidates(matched, matched_scores, COURSE_PERCENTILE)
+
+
+def per_profile(filters, n_profiles):
+    # One filter dict shared by every profile, or one dict per profile
+    if filters is None or isinstance(filters, dict):
+        return [filters or {}] * n_profiles
+    if len(filters) != n_profiles:
+        raise ValueError("filters must be a dict or have one entry per profile")
+    return list(filters)
+
+
+def batch_scores(profiles, vectorizer, tfidf_matrix, chunk_size):
+    # Yields (profile position, row ids, scores) for every profile, scoring a
+    # chunk of profiles with one sparse-sparse product. The product only holds
+    # the non-zero scores, so memory grows with the matches, not chunk x rows.
+    processed = [preprocess_text_simple(profile) for profile in profiles]
+    user_tfidf = vectorizer.transform(processed)
+    for start in range(0, len(processed), chunk_size):
+        chunk = user_tfidf[start:start + chunk_size]
+        scores = (tfidf_matrix @ chunk.T).T.tocsr()
+        scores.sort_indices()
+        for offset in range(scores.shape[0]):
+            row_start, row_end = scores.indptr[offset], scores.indptr[offset + 1]
+            yield start + offset, scores.indices[row_start:row_end], scores.data[row_start:row_end]
+
+
+def recommend_jobs_batch(profiles, df, vectorizer, tfidf_matrix, filters=None, top_k=DEFAULT_TOP_K, min_score=0.0,
+                         facets=None, chunk_size=64, reranker=None):
+    # Same results as calling recommend_job once per profile, in profile order
+    profile_filters = per_profile(filters, len(profiles))
+    results = [None] * len(profiles)
+    for position, rows, scores in batch_scores(profiles, vectorizer, tfidf_matrix, chunk_size):
+        candidates = filter_rows(df, facets, job_filters(**profile_filters[position]))
+        if candidates is not None:
+            in_filter = np.isin(rows, candidates, assume_unique=True)
+            rows, scores = rows[in_filter], scores[in_filter]
+        rerank = None if reranker is None else partial(reranker.rerank, profiles[position])
+        results[position] = select_jobs(df, rows, scores, top_k, min_score, rerank)
+    return results
+
+
+def recommend_courses_batch(profiles, df, vectorizer, tfidf_matrix, filters=None, top_k=DEFAULT_TOP_K, min_score=0.0,
+                            facets=None, chunk_size=64, reranker=None):
+    # Same results as calling recommend_course once per profile, in profile order
+    profile_filters = per_profile(filters, len(profiles))
+    results = [None] * len(profiles)
+    for position, rows, scores in batch_scores(profiles, vectorizer, tfidf_matrix, chunk_size):
+        filtered = filter_rows(df, facets, course_filters(**profile_filters[position]))
+        rerank = None if reranker is None else partial(reranker.rerank, profiles[position])
+        results[position] = select_courses(df, rows, scores, filtered, top_k, min_score, rerank)
+    return results
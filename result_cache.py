@@ -0,0 +1,95 @@
+import threading
+import time
+from collections import OrderedDict
+
+from recommender import preprocess_text_simple
+
+
+def query_key(user_input, **filters):
+    # Token-level normalisation only: the vectorizer ignores whitespace runs,
+    # and filter lists are matched with isin, so their order does not matter.
+    text = " ".join(preprocess_text_simple(user_input).split())
+    normalized = []
+    for name, value in sorted(filters.items()):
+        if value is None or value == 'All' or (isinstance(value, (list, tuple, set)) and len(value) == 0):
+            continue
+        if isinstance(value, (list, tuple, set)):
+            value = tuple(sorted(value))
+        normalized.append((name, value))
+    return text, tuple(normalized)
+
+
+class ResultCache:
+    # Process-wide LRU cache with a TTL, shared by every Streamlit session.
+    # Entries belong to one index version; binding a new version drops them.
+    def __init__(self, max_entries=256, ttl_seconds=30 * 60, clock=time.monotonic):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.clock = clock
+        self.version = None
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def bind(self, version):
+        with self.lock:
+            if version != self.version:
+                if self.entries:
+                    self.invalidations += 1
+                self.entries.clear()
+                self.version = version
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return False, None
+            stored_at, value = entry
+            if self.clock() - stored_at > self.ttl_seconds:
+                del self.entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return False, None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return True, value
+
+    def put(self, key, value):
+        with self.lock:
+            self.entries[key] = (self.clock(), value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_compute(self, key, compute):
+        # Cached values are shared between sessions and must not be mutated
+        found, value = self.get(key)
+        if not found:
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'version': self.version,
+                'size': len(self.entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'invalidations': self.invalidations,
+            }
@@ -0,0 +1,73 @@
+import threading
+
+# One copy of each search index per process, shared by reference by every
+# Streamlit session. st.cache_data unpickles a fresh copy of the frame and the
+# matrix on every rerun; the holder hands out the same read-only object.
+
+
+class SearchIndex:
+    # Everything a page searches, for one source version. Shared between
+    # sessions, so nothing here may be mutated after construction.
+    def __init__(self, name, version, df, vectorizer, tfidf_matrix, facets, engine=None, store=None, reranker=None):
+        self.name = name
+        self.version = version
+        self.df = df
+        self.vectorizer = vectorizer
+        self.tfidf_matrix = tfidf_matrix
+        self.facets = facets
+        self.engine = engine
+        self.store = store
+        self.reranker = reranker
+        for array in (tfidf_matrix.data, tfidf_matrix.indices, tfidf_matrix.indptr):
+            array.flags.writeable = False
+
+
+class IndexHolder:
+    # Lifecycle: load() builds the index for a version the first time it is
+    # asked for; later versions are built while the current one keeps serving
+    # and then swapped in. close() drops the holder's reference; the old
+    # index is freed (and its files unmapped) once the last session that
+    # still holds it finishes its rerun.
+    def __init__(self, name, build):
+        self.name = name
+        self.build = build
+        self.current = None
+        self.lock = threading.Lock()
+        self.loads = 0
+        self.swaps = 0
+
+    def load(self, version, *args):
+        current = self.current
+        if current is not None and current.version == version:
+            return current
+        # Another session is already building; keep serving what we have
+        if not self.lock.acquire(blocking=current is None):
+            return current
+        try:
+            if self.current is not None and self.current.version == version:
+                return self.current
+            index = self.build(version, *args)
+            self.loads += 1
+            self.swap(index)
+            return index
+        finally:
+            self.lock.release()
+
+    def swap(self, index):
+        previous, self.current = self.current, index
+        if previous is not None:
+            self.swaps += 1
+        return previous
+
+    def close(self):
+        with self.lock:
+            self.current = None
+
+    def stats(self):
+        current = self.current
+        return {
+            'name': self.name,
+            'version': None if current is None else current.version,
+            'loads': self.loads,
+            'swaps': self.swaps,
+        }
@@ -0,0 +1,42 @@
+import string
+
+import pandas as pd
+
+# Column-at-a-time versions of preprocess_text_simple / remove_asterisks with
+# byte-identical output. Rows are joined into one string per chunk, lowered
+# once, and punctuation is deleted from the UTF-8 bytes: every punctuation
+# character is ASCII and UTF-8 never uses ASCII bytes inside a multi-byte
+# character, so deleting those bytes is exactly str.translate's result.
+# '*' is part of string.punctuation, so the asterisk regex has nothing left to do.
+PUNCTUATION_BYTES = string.punctuation.encode('ascii')
+SEPARATOR = '\x00'
+DEFAULT_CHUNK_SIZE = 2000
+
+
+def normalize_text(text):
+    lowered = text.lower().encode('utf-8', 'surrogatepass')
+    return lowered.translate(None, PUNCTUATION_BYTES).decode('utf-8', 'surrogatepass')
+
+
+def normalize_chunk(values):
+    joined = SEPARATOR.join(values)
+    if joined.count(SEPARATOR) != len(values) - 1:
+        # A row already contains the separator; fall back to one row at a time
+        return [normalize_text(value) for value in values]
+    # lower() on the joined text matches per-row lower(): the separator is not
+    # cased or case-ignorable, so it bounds context rules like the final sigma.
+    return normalize_text(joined).split(SEPARATOR)
+
+
+def normalize_text_column(series, chunk_size=DEFAULT_CHUNK_SIZE):
+    # Same as series.apply(preprocess_text_simple): missing values become ""
+    values = series.where(series.notna(), '').tolist()
+    normalized = []
+    for start in range(0, len(values), chunk_size):
+        normalized.extend(normalize_chunk(values[start:start + chunk_size]))
+    return pd.Series(normalized, index=series.index, name=series.name)
+
+
+def remove_asterisks_column(series):
+    # Same as series.apply(remove_asterisks): missing values stay missing
+    return series.str.replace('*', '', regex=False)
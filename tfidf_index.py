@@ -0,0 +1,172 @@
+import hashlib
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+import scipy.sparse as sp
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+from index_compaction import compact_index
+
+# Bump this whenever the on-disk layout or the text preprocessing that feeds
+# the vectorizer changes, so old snapshots are never loaded by newer code.
+INDEX_FORMAT_VERSION = 2
+# float32 weights halve the matrix; cosine ranking does not need float64
+TFIDF_DTYPE = np.float32
+INDEX_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'index_cache')
+
+MANIFEST_FILE = 'manifest.json'
+ARRAY_FILES = ('data', 'indices', 'indptr', 'idf', 'terms', 'row_ids')
+
+
+def content_hash(raw_bytes):
+    return hashlib.sha256(raw_bytes).hexdigest()
+
+
+def file_content_hash(path, block_size=1 << 20):
+    # Same digest as content_hash(open(path, 'rb').read()) without holding the file
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def snapshot_path(name, source_hash, index_dir=INDEX_DIR, compaction=None):
+    # A compacted index gets its own path, so changing the setting rebuilds it
+    suffix = ''
+    if compaction:
+        suffix = '-c' + content_hash(json.dumps(compaction, sort_keys=True).encode())[:8]
+    return os.path.join(index_dir, name, f"v{INDEX_FORMAT_VERSION}-{source_hash[:16]}{suffix}")
+
+
+def new_snapshot(name, source_hash, index_dir=INDEX_DIR, compaction=None):
+    final_path = snapshot_path(name, source_hash, index_dir, compaction)
+    tmp_path = f"{final_path}.tmp-{os.getpid()}"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+    return tmp_path, final_path
+
+
+def write_manifest(path, name, source_hash, shape, nnz, dtype, stop_words, compaction=None):
+    manifest = {
+        'format_version': INDEX_FORMAT_VERSION,
+        'name': name,
+        'source_hash': source_hash,
+        'shape': list(shape),
+        'nnz': int(nnz),
+        'dtype': str(dtype),
+        'vectorizer_params': {'stop_words': stop_words},
+        'compaction': compaction or None,
+        'created_at': time.time(),
+    }
+    with open(os.path.join(path, MANIFEST_FILE), 'w') as f:
+        json.dump(manifest, f, indent=2)
+
+
+def publish_snapshot(name, tmp_path, final_path, index_dir=INDEX_DIR):
+    # Publishing by rename keeps readers from ever seeing a half-written snapshot.
+    if os.path.isdir(final_path):
+        shutil.rmtree(tmp_path)
+    else:
+        os.rename(tmp_path, final_path)
+    prune_snapshots(name, keep=final_path, index_dir=index_dir)
+    return final_path
+
+
+def save_index(name, source_hash, vectorizer, tfidf_matrix, row_ids, index_dir=INDEX_DIR, compaction=None):
+    tmp_path, final_path = new_snapshot(name, source_hash, index_dir, compaction)
+
+    tfidf_matrix = sp.csr_matrix(tfidf_matrix)
+    terms = vectorizer.get_feature_names_out().astype(str)
+    arrays = {
+        'data': tfidf_matrix.data,
+        'indices': tfidf_matrix.indices,
+        'indptr': tfidf_matrix.indptr,
+        'idf': vectorizer.idf_,
+        'terms': terms,
+        'row_ids': np.asarray(row_ids, dtype=np.int64),
+    }
+    for key, array in arrays.items():
+        np.save(os.path.join(tmp_path, f"{key}.npy"), array)
+
+    write_manifest(tmp_path, name, source_hash, tfidf_matrix.shape, tfidf_matrix.nnz, tfidf_matrix.dtype, vectorizer.stop_words,
+                   compaction)
+    return publish_snapshot(name, tmp_path, final_path, index_dir)
+
+
+def load_index(name, source_hash, mmap=True, index_dir=INDEX_DIR, compaction=None):
+    path = snapshot_path(name, source_hash, index_dir, compaction)
+    manifest_file = os.path.join(path, MANIFEST_FILE)
+    if not os.path.isfile(manifest_file):
+        return None
+    try:
+        with open(manifest_file) as f:
+            manifest = json.load(f)
+        if manifest['format_version'] != INDEX_FORMAT_VERSION or manifest['source_hash'] != source_hash:
+            return None
+        if manifest.get('compaction') != (compaction or None):
+            return None
+        mmap_mode = 'r' if mmap else None
+        arrays = {key: np.load(os.path.join(path, f"{key}.npy"), mmap_mode=mmap_mode) for key in ARRAY_FILES}
+    except (OSError, ValueError, KeyError):
+        return None
+
+    tfidf_matrix = sp.csr_matrix(
+        (arrays['data'], arrays['indices'], arrays['indptr']),
+        shape=tuple(manifest['shape']),
+        copy=False,
+    )
+    vectorizer = TfidfVectorizer(dtype=np.dtype(manifest['dtype']).type, **manifest['vectorizer_params'])
+    vectorizer.vocabulary_ = {term: i for i, term in enumerate(arrays['terms'].tolist())}
+    vectorizer.idf_ = np.asarray(arrays['idf'])
+    return vectorizer, tfidf_matrix, np.asarray(arrays['row_ids']), manifest
+
+
+def snapshot_parts(entry):
+    # 'v2-<source hash>-c<setting hash>' -> ('v2', '<source hash>', 'c<setting hash>')
+    version, _, rest = entry.partition('-')
+    source, _, setting = rest.partition('-')
+    return version, source, setting
+
+
+def prune_snapshots(name, keep, index_dir=INDEX_DIR):
+    # Drops snapshots in an older format and those of older sources built with
+    # the same compaction setting as keep. Snapshots of other settings stay:
+    # the app or another tool may be serving one of them. Directories still
+    # being written by another process are left alone too.
+    parent = os.path.join(index_dir, name)
+    if not os.path.isdir(parent):
+        return
+    keep_version, _, keep_setting = snapshot_parts(os.path.basename(keep))
+    for entry in os.listdir(parent):
+        path = os.path.join(parent, entry)
+        if path == keep or '.tmp-' in entry or not os.path.isdir(path):
+            continue
+        version, _, setting = snapshot_parts(entry)
+        if version != keep_version or setting == keep_setting:
+            shutil.rmtree(path, ignore_errors=True)
+
+
+def build_or_load_index(name, source_hash, row_ids, build_corpus, stop_words='english', index_dir=INDEX_DIR,
+                        compaction=None):
+    # build_corpus is only called on a cache miss, so the preprocessing pass is skipped too.
+    # compaction is an index_compaction setting, applied after the fit.
+    loaded = load_index(name, source_hash, index_dir=index_dir, compaction=compaction)
+    if loaded is not None:
+        vectorizer, tfidf_matrix, stored_row_ids, _ = loaded
+        if np.array_equal(stored_row_ids, np.asarray(row_ids)):
+            return vectorizer, tfidf_matrix
+
+    vectorizer = TfidfVectorizer(stop_words=stop_words, dtype=TFIDF_DTYPE)
+    tfidf_matrix = vectorizer.fit_transform(build_corpus())
+    if compaction:
+        vectorizer, tfidf_matrix = compact_index(vectorizer, tfidf_matrix, **compaction)
+    try:
+        save_index(name, source_hash, vectorizer, tfidf_matrix, row_ids, index_dir=index_dir, compaction=compaction)
+    except OSError:
+        # A read-only or full disk should never stop the app from serving.
+        pass
+    return vectorizer, tfidf_matrix
@@ -0,0 +1,121 @@
+import contextvars
+import json
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager, nullcontext
+
+import numpy as np
+
+# Per-stage timing for recommendation requests. A request opens a trace with
+# tracer.request(...); code on the hot path marks stages with span(stage).
+# When tracing is off (the default) span() returns one shared no-op context
+# manager after a single context-variable lookup, and request() does nothing.
+# When it is on, each finished request writes one JSON log line and feeds a
+# rolling window of timings per (request, stage).
+logger = logging.getLogger('tristep.trace')
+NULL_SPAN = nullcontext()
+DEFAULT_WINDOW = 1000
+HISTOGRAM_EDGES_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+current_trace = contextvars.ContextVar('current_trace', default=None)
+
+
+class RequestTrace:
+    def __init__(self, name, fields):
+        self.name = name
+        self.fields = fields
+        self.spans = []
+
+    @contextmanager
+    def span(self, stage):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.spans.append((stage, time.perf_counter() - start))
+
+
+def span(stage):
+    trace = current_trace.get()
+    if trace is None:
+        return NULL_SPAN
+    return trace.span(stage)
+
+
+class Tracer:
+    # Shared by every session in the process; the windows are guarded by a lock
+    def __init__(self, enabled=False, window=DEFAULT_WINDOW):
+        self.enabled = enabled
+        self.window = window
+        self.timings = {}
+        self.last = {}
+        self.lock = threading.Lock()
+
+    @contextmanager
+    def request(self, name, **fields):
+        if not self.enabled:
+            yield None
+            return
+        trace = RequestTrace(name, fields)
+        token = current_trace.set(trace)
+        start = time.perf_counter()
+        try:
+            with trace.span('total'):
+                yield trace
+        finally:
+            current_trace.reset(token)
+            self.record(trace, time.time() - (time.perf_counter() - start))
+
+    def record(self, trace, started_at):
+        # Stages that run more than once in a request (e.g. per rendered row) are summed
+        stages = {}
+        for stage, seconds in trace.spans:
+            stages[stage] = stages.get(stage, 0.0) + seconds * 1000
+        with self.lock:
+            for stage, ms in stages.items():
+                self.timings.setdefault((trace.name, stage), deque(maxlen=self.window)).append(ms)
+            self.last[trace.name] = stages
+        logger.info(json.dumps({
+            'request': trace.name,
+            'started_at': round(started_at, 3),
+            **trace.fields,
+            'stages_ms': {stage: round(ms, 3) for stage, ms in stages.items()},
+        }))
+
+    def summary(self):
+        # {request: {stage: count and percentiles over the rolling window}}
+        with self.lock:
+            windows = {key: np.array(values) for key, values in self.timings.items()}
+        summary = {}
+        for (name, stage), values in sorted(windows.items()):
+            summary.setdefault(name, {})[stage] = {
+                'count': len(values),
+                'p50_ms': round(float(np.percentile(values, 50)), 3),
+                'p95_ms': round(float(np.percentile(values, 95)), 3),
+                'p99_ms': round(float(np.percentile(values, 99)), 3),
+                'max_ms': round(float(values.max()), 3),
+            }
+        return summary
+
+    def histogram(self, name, stage, edges=HISTOGRAM_EDGES_MS):
+        # Counts per latency bucket: [0, 1), [1, 2), ... [1000, inf) ms
+        with self.lock:
+            values = np.array(self.timings.get((name, stage), ()))
+        counts = np.bincount(np.searchsorted(edges, values, side='right'), minlength=len(edges) + 1)
+        labels = [f"<{edges[0]}"] + [f"{low}-{high}" for low, high in zip(edges, edges[1:])] + [f">={edges[-1]}"]
+        return dict(zip(labels, counts.tolist()))
+
+
+tracer = Tracer()
+
+
+def configure(enabled):
+    # Turns tracing on or off for the process; the JSON lines go to stderr
+    # unless the logger already has a handler
+    tracer.enabled = enabled
+    if enabled and not logger.handlers:
+        logger.addHandler(logging.StreamHandler())
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
@@ -0,0 +1,70 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+# Start-up work run off the script thread, so the first page paints before
+# the sheets are fetched and the indexes fitted. Each named task runs once per
+# Warmup on its own worker, concurrently with the others; a page waits only
+# for the task it needs. A task is called as fn(report, *args) and may call
+# report(stage) to say what it is doing, for progress display.
+
+
+class Warmup:
+    def __init__(self, max_workers=4, clock=time.monotonic):
+        self.pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='warmup')
+        self.clock = clock
+        self.tasks = {}
+        self.stages = {}
+        self.started_at = {}
+        self.durations = {}
+        self.lock = threading.Lock()
+
+    def submit(self, name, fn, *args):
+        with self.lock:
+            if name not in self.tasks:
+                self.stages[name] = 'queued'
+                self.started_at[name] = self.clock()
+                self.tasks[name] = self.pool.submit(self.run, name, fn, *args)
+            return self.tasks[name]
+
+    def run(self, name, fn, *args):
+        try:
+            result = fn(lambda stage: self.stages.__setitem__(name, stage), *args)
+            self.stages[name] = 'ready'
+            return result
+        except BaseException:
+            self.stages[name] = 'failed'
+            raise
+        finally:
+            self.durations[name] = self.clock() - self.started_at[name]
+
+    def done(self, name):
+        task = self.tasks.get(name)
+        return task is not None and task.done()
+
+    def wait(self, name, timeout=None):
+        # True once the task has finished, successfully or not
+        done, _ = wait([self.tasks[name]], timeout)
+        return bool(done)
+
+    def result(self, name, timeout=None):
+        return self.tasks[name].result(timeout)
+
+    def value(self, name, default=None):
+        # The task's result if it finished successfully, without waiting
+        task = self.tasks.get(name)
+        if task is None or not task.done() or task.exception() is not None:
+            return default
+        return task.result()
+
+    def stage(self, name):
+        return self.stages.get(name)
+
+    def elapsed(self, name):
+        return self.durations.get(name, self.clock() - self.started_at[name])
+
+    def status(self):
+        return {name: {'stage': self.stages[name], 'seconds': round(self.elapsed(name), 3)} for name in self.tasks}
+
+    def shutdown(self):
+        self.pool.shutdown(wait=True)